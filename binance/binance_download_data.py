@@ -1,11 +1,14 @@
+import os
 import asyncio
 from typing import List
 
 import numpy as np
 import pandas as pd
 
-from common import mkdirs
-from binance.client import Client, AsyncClient
+from binance.client import Client
+from binance_bot_simulation.binance.kline_store import KlineStore, interval_minutes, to_ms
+from binance_bot_simulation.binance.kline_downloader import KlineDownloader
+from binance_bot_simulation.binance.resample import resample_klines
 
 INTERVALS = [
     Client.KLINE_INTERVAL_1MINUTE,
@@ -48,65 +51,116 @@ def change_df_types(df):
     df.set_index('Close time', inplace=True)
 
 
-async def download_raw_data(binance_client, interval, coin, quoted, start_time: pd.Timestamp, end_time: pd.Timestamp,
-                            verbose=False):
+async def download_klines(downloader: KlineDownloader, interval, coin, quoted,
+                          start_time: pd.Timestamp, end_time: pd.Timestamp):
+    """
+    Download from binance the klines of coin/quoted that opened and closed between start_time and end_time
+    :return: DataFrame of the klines, indexed by 'Close time'
+    """
     symbol = coin + quoted
-    try:
-        raw_df = pd.read_csv(
-            f'cache/{symbol}/{start_time.strftime("%Y_%m_%d")}/{end_time.strftime("%Y_%m_%d")}/{interval}.csv')
-        if 'isClose' not in raw_df.columns:
-            raw_df['isClose'] = True
-        if verbose:
-            print(f'read interval {symbol} {interval} data')
-        change_df_types(raw_df)
-    except FileNotFoundError:
-        if verbose:
-            print(f'download interval {symbol} {interval} data')
-        start_str = f'{start_time.timestamp()}'
-        end_str = f'{end_time.timestamp()}'
-        data = await binance_client.get_historical_klines(symbol, interval, start_str=start_str, end_str=end_str)
-        raw_df = pd.DataFrame(data, columns=['Open time',
-                                             'Open',
-                                             'High',
-                                             'Low',
-                                             'Close',
-                                             'Volume',
-                                             'Close time',
-                                             'Quote asset volume',
-                                             'Number of trades',
-                                             'Taker buy base asset volume',
-                                             'Taker buy quote asset volume',
-                                             'Ignore'])
-
-        minutes_interval = {
-            'm': 1,
-            'h': 60,
-            'd': 24 * 60,
-            'w': 7 * 24 * 60,
-            'M': 30 * 24 * 60
-        }
-
-        raw_df.loc[:, 'Coin'] = coin
-        raw_df.loc[:, 'interval'] = interval
-        raw_df.loc[:, 'minutes_interval'] = int(interval[:-1]) * minutes_interval[interval[-1]]
-        raw_df = raw_df[:-1]  # last candle is not closed yet
-        raw_df = raw_df.drop("Ignore", axis=1)
-        change_df_types(raw_df)
-        if 'isClose' not in raw_df.columns:
-            raw_df['isClose'] = True
-        mkdirs(f'cache/{symbol}/{start_time.strftime("%Y_%m_%d")}/{end_time.strftime("%Y_%m_%d")}')
-        raw_df.to_csv(
-            f'cache/{symbol}/{start_time.strftime("%Y_%m_%d")}/{end_time.strftime("%Y_%m_%d")}/{interval}.csv')
-
+    data = await downloader.download(symbol, interval, start_time, end_time)
+    raw_df = pd.DataFrame(data, columns=['Open time',
+                                         'Open',
+                                         'High',
+                                         'Low',
+                                         'Close',
+                                         'Volume',
+                                         'Close time',
+                                         'Quote asset volume',
+                                         'Number of trades',
+                                         'Taker buy base asset volume',
+                                         'Taker buy quote asset volume',
+                                         'Ignore'])
+
+    raw_df.loc[:, 'Coin'] = coin
+    raw_df.loc[:, 'interval'] = interval
+    raw_df.loc[:, 'minutes_interval'] = interval_minutes(interval)
+    # binance close time is 1ms before the next candle opens, the last candles may be after end_time or not closed yet
+    raw_df = raw_df.loc[raw_df['Close time'] < min(to_ms(end_time), to_ms(pd.Timestamp.now('UTC').tz_localize(None)))]
+    raw_df = raw_df.drop("Ignore", axis=1)
+    change_df_types(raw_df)
+    if 'isClose' not in raw_df.columns:
+        raw_df['isClose'] = True
     return raw_df
 
 
+async def download_raw_data(downloader: KlineDownloader, interval, coin, quoted,
+                            start_time: pd.Timestamp, end_time: pd.Timestamp,
+                            verbose=False, kline_store: KlineStore = None):
+    """
+    Read the klines of coin/quoted from the kline store, only the time ranges that the store doesn't have yet are
+    downloaded and merged into the store.
+    """
+    symbol = coin + quoted
+    if kline_store is None:
+        kline_store = KlineStore()
+    # candles that didn't close yet are not downloaded, the time after now can't be covered
+    end_time = min(end_time, pd.Timestamp.now('UTC').tz_localize(None))
+    missing_ranges = kline_store.missing_ranges(symbol, interval, start_time, end_time)
+    if len(missing_ranges) > 0:
+        if verbose:
+            print(f'download interval {symbol} {interval} data '
+                  f'{", ".join(f"[{start} - {end}]" for start, end in missing_ranges)}')
+        dfs = await asyncio.gather(*[download_klines(downloader, interval, coin, quoted, start, end)
+                                     for start, end in missing_ranges])
+        # a range is covered only until the last candle that binance returned in it, so the candles that weren't
+        # there yet are downloaded next time
+        covered_ranges = [(start, min(end, df.index[-1])) for (start, end), df in zip(missing_ranges, dfs)
+                          if len(df) > 0]
+        kline_store.merge(symbol, interval, pd.concat(dfs), covered_ranges)
+    elif verbose:
+        print(f'read interval {symbol} {interval} data')
+
+    return kline_store.read(symbol, interval, start_time=start_time, end_time=end_time)
+
+
+def migrate_csv_cache(kline_store: KlineStore = None, csv_root='cache', verbose=False):
+    """
+    Move the klines of the old csv cache into the kline store, the csv files are in
+    'cache/{symbol}/{start}/{end}/{interval}.csv' and 'cache/{symbol}/All_Time/{interval}.csv'.
+    The csv files are not deleted.
+    """
+    if kline_store is None:
+        kline_store = KlineStore()
+    for symbol in sorted(os.listdir(csv_root)):
+        symbol_folder = os.path.join(csv_root, symbol)
+        if not os.path.isdir(symbol_folder) or os.path.abspath(symbol_folder) == os.path.abspath(kline_store.root):
+            continue
+        for folder, _, files in os.walk(symbol_folder):
+            for file_name in sorted(files):
+                interval, extension = os.path.splitext(file_name)
+                if extension != '.csv' or interval not in INTERVALS:
+                    continue
+                if verbose:
+                    print(f'migrate {os.path.join(folder, file_name)}')
+                df = pd.read_csv(os.path.join(folder, file_name))
+                if len(df) == 0:
+                    continue
+                if 'isClose' not in df.columns:
+                    df['isClose'] = True
+                change_df_types(df)
+
+                # the folders of the csv are the days of the time range that it was downloaded for, the download
+                # started at the exact start time so only the part of the range that the klines span is covered
+                start_time, end_time = df['Open time'].iloc[0], df.index[-1]
+                range_folders = os.path.relpath(folder, symbol_folder).split(os.sep)
+                try:
+                    folder_start, folder_end = (pd.to_datetime(name, format='%Y_%m_%d') for name in range_folders)
+                    start_time, end_time = max(start_time, folder_start), min(end_time, folder_end)
+                except ValueError:
+                    pass
+                kline_store.merge(symbol, interval, df, [(start_time, end_time)])
+
+
 async def __download_data(coins,
                           quoted,
                           start_time: pd.Timestamp,
                           end_time: pd.Timestamp = None,
                           verbose=False,
-                          intervals: List[str] = None):
+                          intervals: List[str] = None,
+                          kline_store: KlineStore = None,
+                          downloader: KlineDownloader = None,
+                          base_interval: str = None):
     """
     Download data from binance by coin name and quoted asset name for example coin='ETH' and quoted='BTC' will download
     the dataframe for ETHBTC symbol
@@ -114,9 +168,15 @@ async def __download_data(coins,
     :param quoted: the quoted asset that you want to download
     :param verbose: boolean to show what the download data is downloading now
     :param intervals: list of intervals that you want to download
+    :param kline_store: the store of the downloaded klines, the default is the store in 'cache/klines'
+    :param downloader: the downloader of the klines from binance, it limits the rate of all the downloads together
+    :param base_interval: if it is given only this interval is downloaded and stored,
+                          the other intervals are resampled from it
     :return: list of all data frames
     """
-    binance_client = AsyncClient("", "")
+    close_downloader = downloader is None
+    if downloader is None:
+        downloader = KlineDownloader()
     if intervals is None:
         raise ValueError('intervals parameter must be an interval value or iterator of intervals, interval value can '
                          'be one of [1m, 5m, 15m, 30m, 1h, 2h, 4h, 6h, 8h, 12h, 1d, 3d, 1w, 1M]')
@@ -125,14 +185,26 @@ async def __download_data(coins,
     dfs = {coin: {} for coin in coins}
 
     async def download_task(coin, interval):
-        dfs[coin][interval] = await download_raw_data(binance_client, interval, coin, quoted,
-                                                      start_time=start_time, end_time=end_time, verbose=verbose)
+        dfs[coin][interval] = await download_raw_data(downloader, interval, coin, quoted,
+                                                      start_time=start_time, end_time=end_time, verbose=verbose,
+                                                      kline_store=kline_store)
 
+    download_intervals = intervals if base_interval is None else [base_interval]
     await asyncio.gather(
         *[download_task(coin, interval)
-          for coin in coins for interval in intervals]
+          for coin in coins for interval in download_intervals]
     )
-    await binance_client.session.close()
+    if close_downloader:
+        await downloader.close()
+
+    if base_interval is not None:
+        for coin in coins:
+            base_df = dfs[coin][base_interval]
+            for interval in intervals:
+                if interval != base_interval:
+                    dfs[coin][interval] = resample_klines(base_df, interval)
+            if base_interval not in intervals:
+                del dfs[coin][base_interval]
     return dfs
 
 
@@ -5,6 +5,6 @@ class BinancePortfolio(Portfolio):
 
     BINANCE_FEE = 0.1
 
-    def __init__(self, client, timestamp, **coins):
-        super().__init__(timestamp, BinancePortfolio.BINANCE_FEE, **coins)
+    def __init__(self, client, timestamp, *, quoted='USDT', **coins):
+        super().__init__(timestamp, BinancePortfolio.BINANCE_FEE, quoted=quoted, **coins)
         self.client = client
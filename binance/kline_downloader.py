@@ -0,0 +1,150 @@
+import time
+import asyncio
+
+import aiohttp
+import pandas as pd
+
+from binance_bot_simulation.binance.kline_store import to_ms, interval_minutes
+
+
+class WeightLimiter:
+    """
+    Token bucket of binance requests weight, the bucket is filled continuously up to the weight limit of a minute.
+    """
+
+    def __init__(self, weight_per_minute):
+        self.capacity = weight_per_minute
+        self.available = weight_per_minute
+        self.rate = weight_per_minute / 60
+        self.last_update = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def __refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.last_update) * self.rate)
+        self.last_update = now
+
+    async def acquire(self, weight):
+        """
+        Wait until there is enough weight for a request and take it
+        """
+        async with self.lock:
+            self.__refill()
+            while self.available < weight:
+                await asyncio.sleep((weight - self.available) / self.rate)
+                self.__refill()
+            self.available -= weight
+
+    def sync_used_weight(self, used_weight):
+        """
+        :param used_weight: the weight that binance says that was used in the last minute
+        """
+        self.__refill()
+        self.available = min(self.available, self.capacity - used_weight)
+
+    def pause(self, seconds):
+        """
+        Don't let any request to go out for the next seconds
+        """
+        self.__refill()
+        self.available = min(self.available, 0) - seconds * self.rate
+
+
+class KlineDownloader:
+    """
+    Download klines from the binance REST api.
+    Long time ranges are split into pages of `PAGE_LIMIT` candles that are downloaded concurrently, all of the
+    requests share a budget of request weight per minute, and requests that failed on a transient error
+    (connection errors, rate limit or server errors) are retried with exponential backoff.
+    """
+
+    BASE_URL = 'https://api.binance.com'
+    KLINES_PATH = '/api/v3/klines'
+    PAGE_LIMIT = 1000
+    # the weight of klines request with limit of 1000
+    KLINES_WEIGHT = 2
+    RETRY_STATUSES = {418, 429, 500, 502, 503, 504}
+
+    def __init__(self,
+                 base_url=BASE_URL,
+                 weight_per_minute=1200,
+                 max_concurrency=10,
+                 max_retries=5,
+                 backoff=1.0):
+        """
+        :param base_url: the url of the api, for example url of a local server for tests
+        :param weight_per_minute: the budget of request weight, should be lower than the limit of binance
+        :param max_concurrency: maximum number of requests at the same time
+        :param max_retries: how many times a page is retried before giving up
+        :param backoff: seconds to wait before the first retry, the wait is doubled on each retry
+        """
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.limiter = WeightLimiter(weight_per_minute)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    @staticmethod
+    def pages(interval, start_ms, end_ms):
+        """
+        :return: list of the (start, end) ranges in milliseconds of the pages of [start_ms, end_ms]
+        """
+        if interval[-1] == 'M':
+            # months are not the same length, but 1000 months are long enough
+            return [(start_ms, end_ms)]
+        page_ms = KlineDownloader.PAGE_LIMIT * interval_minutes(interval) * 60 * 1000
+        return [(page_start, min(page_start + page_ms - 1, end_ms))
+                for page_start in range(start_ms, end_ms + 1, page_ms)]
+
+    async def download(self, symbol, interval, start_time: pd.Timestamp, end_time: pd.Timestamp):
+        """
+        Download the klines that opened between start_time and end_time.
+        :return: list of klines as binance returns them, sorted by their open time
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        pages = KlineDownloader.pages(interval, to_ms(start_time), to_ms(end_time))
+        pages = await asyncio.gather(*[self.__download_page(symbol, interval, page_start, page_end)
+                                       for page_start, page_end in pages])
+        return [kline for page in pages for kline in page]
+
+    async def __download_page(self, symbol, interval, start_ms, end_ms):
+        params = {
+            'symbol': symbol,
+            'interval': interval,
+            'startTime': start_ms,
+            'endTime': end_ms,
+            'limit': KlineDownloader.PAGE_LIMIT,
+        }
+        for retry in range(self.max_retries + 1):
+            await self.limiter.acquire(KlineDownloader.KLINES_WEIGHT)
+            try:
+                async with self.semaphore:
+                    async with self.session.get(self.base_url + KlineDownloader.KLINES_PATH, params=params) as response:
+                        used_weight = response.headers.get('X-MBX-USED-WEIGHT-1M')
+                        if used_weight is not None:
+                            self.limiter.sync_used_weight(int(used_weight))
+                        if response.status == 200:
+                            return await response.json()
+                        if response.status not in KlineDownloader.RETRY_STATUSES or retry == self.max_retries:
+                            response.raise_for_status()
+                        retry_after = response.headers.get('Retry-After')
+                        if retry_after is not None:
+                            # binance asks to stop all of the requests, not just this one
+                            self.limiter.pause(int(retry_after))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if retry == self.max_retries:
+                    raise
+            await asyncio.sleep(self.backoff * 2 ** retry)
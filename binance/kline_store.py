@@ -0,0 +1,223 @@
+import os
+import json
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+KLINE_SCHEMA = pa.schema([
+    ('Open time', pa.int64()),
+    ('Open', pa.float64()),
+    ('High', pa.float64()),
+    ('Low', pa.float64()),
+    ('Close', pa.float64()),
+    ('Volume', pa.float64()),
+    ('Close time', pa.int64()),
+    ('Quote asset volume', pa.float64()),
+    ('Number of trades', pa.int64()),
+    ('Taker buy base asset volume', pa.float64()),
+    ('Taker buy quote asset volume', pa.float64()),
+    ('Coin', pa.string()),
+    ('interval', pa.string()),
+    ('minutes_interval', pa.int64()),
+    ('isClose', pa.bool_()),
+])
+
+COVERAGE_METADATA_KEY = b'coverage'
+
+MINUTES_OF_UNIT = {
+    'm': 1,
+    'h': 60,
+    'd': 24 * 60,
+    'w': 7 * 24 * 60,
+    'M': 30 * 24 * 60
+}
+
+
+def interval_minutes(interval: str) -> int:
+    """
+    :param interval: kline interval, for example '15m' or '4h'
+    :return: the length of the interval in minutes (month is 30 days)
+    """
+    return int(interval[:-1]) * MINUTES_OF_UNIT[interval[-1]]
+
+
+def to_ms(timestamp) -> int:
+    return pd.Timestamp(timestamp).value // 10 ** 6
+
+
+def floor_to_interval(ms: int, interval: str) -> int:
+    """
+    :return: the open time in milliseconds of the candle of interval that ms is inside of it
+    """
+    if interval[-1] == 'M':
+        return to_ms(pd.Timestamp(ms, unit='ms').to_period('M').start_time)
+    interval_ms = interval_minutes(interval) * 60 * 1000
+    # weekly candles open on monday, 3 days before the epoch
+    offset = 3 * 24 * 60 * 60 * 1000 if interval[-1] == 'w' else 0
+    return (ms + offset) // interval_ms * interval_ms - offset
+
+
+def ceil_to_interval(ms: int, interval: str) -> int:
+    floor = floor_to_interval(ms, interval)
+    if floor == ms:
+        return ms
+    if interval[-1] == 'M':
+        return to_ms((pd.Timestamp(ms, unit='ms').to_period('M') + 1).start_time)
+    return floor + interval_minutes(interval) * 60 * 1000
+
+
+def _times_to_ms(times) -> np.ndarray:
+    return np.asarray(pd.to_datetime(times), dtype='datetime64[ms]').view(np.int64)
+
+
+def _merge_ranges(ranges):
+    """
+    :param ranges: list of [start, end] ranges
+    :return: sorted list of the union of the ranges, without overlapping or touching ranges
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class KlineStore:
+    """
+    Columnar store of klines on disk, a single parquet file per symbol and interval.
+    The columns are saved with their types and the times as milliseconds since epoch, so reading doesn't need to parse
+    anything, and it can read only some of the columns and only the row groups of a time range.
+    The store also saves the time ranges that it covers, a range is covered when all of the candles that opened
+    and closed inside it are in the store.
+    """
+
+    ROW_GROUP_SIZE = 64 * 1024
+
+    def __init__(self, root='cache/klines'):
+        self.root = root
+
+    def path(self, symbol, interval):
+        return os.path.join(self.root, symbol, f'{interval}.parquet')
+
+    def exists(self, symbol, interval):
+        return os.path.exists(self.path(symbol, interval))
+
+    def coverage(self, symbol, interval):
+        """
+        :return: sorted list of the [start, end] ranges in milliseconds that the store has
+        """
+        if not self.exists(symbol, interval):
+            return []
+        metadata = pq.read_schema(self.path(symbol, interval)).metadata or {}
+        return json.loads(metadata.get(COVERAGE_METADATA_KEY, b'[]'))
+
+    def covers(self, symbol, interval, start_time: pd.Timestamp, end_time: pd.Timestamp):
+        return len(self.missing_ranges(symbol, interval, start_time, end_time)) == 0
+
+    def missing_ranges(self, symbol, interval, start_time: pd.Timestamp, end_time: pd.Timestamp):
+        """
+        :return: list of the (start, end) time ranges inside [start_time, end_time] that the store doesn't cover,
+                 the ranges are aligned to the open times of the interval candles
+        """
+        start = ceil_to_interval(to_ms(start_time), interval)
+        end = floor_to_interval(to_ms(end_time), interval)
+        missing = []
+        for range_start, range_end in self.coverage(symbol, interval):
+            if range_end <= start:
+                continue
+            if range_start >= end:
+                break
+            if range_start > start:
+                missing.append((start, range_start))
+            start = max(start, range_end)
+        if start < end:
+            missing.append((start, end))
+        return [(pd.Timestamp(start, unit='ms'), pd.Timestamp(end, unit='ms')) for start, end in missing]
+
+    def read(self, symbol, interval, columns=None, start_time: pd.Timestamp = None, end_time: pd.Timestamp = None,
+             memory_map=True) -> pd.DataFrame:
+        """
+        Read klines from the store as DataFrame indexed by 'Close time', the same as `change_df_types` returns.
+        :param columns: the columns to read, the default is all of them
+        :param start_time: read only candles that opened from this time
+        :param end_time: read only candles that closed until this time
+        :param memory_map: map the file to memory instead of reading it
+        """
+        if columns is not None and 'Close time' not in columns:
+            columns = list(columns) + ['Close time']
+        filters = []
+        if start_time is not None:
+            filters.append(('Open time', '>=', to_ms(start_time)))
+        if end_time is not None:
+            filters.append(('Close time', '<=', to_ms(end_time)))
+        table = pq.read_table(self.path(symbol, interval),
+                              columns=columns,
+                              filters=filters or None,
+                              memory_map=memory_map)
+        return KlineStore.table_to_df(table)
+
+    def write(self, symbol, interval, df: pd.DataFrame, coverage):
+        """
+        Replace the klines of symbol and interval, the file is replaced atomically.
+        :param df: klines DataFrame indexed by 'Close time'
+        :param coverage: list of the [start, end] ranges in milliseconds that df covers
+        """
+        table = KlineStore.df_to_table(df, interval)
+        metadata = {COVERAGE_METADATA_KEY: json.dumps(_merge_ranges(coverage)).encode()}
+        table = table.replace_schema_metadata(metadata)
+
+        path = self.path(symbol, interval)
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path, row_group_size=KlineStore.ROW_GROUP_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def merge(self, symbol, interval, df: pd.DataFrame, ranges):
+        """
+        Add klines to the store, candles that already in the store are replaced.
+        :param ranges: list of the (start_time, end_time) ranges that df covers
+        """
+        # only candles that are all inside a range are covered by it
+        ranges = [[ceil_to_interval(to_ms(start_time), interval), floor_to_interval(to_ms(end_time), interval)]
+                  for start_time, end_time in ranges]
+        coverage = self.coverage(symbol, interval) + [[start, end] for start, end in ranges if start < end]
+        if self.exists(symbol, interval):
+            df = pd.concat([self.read(symbol, interval), df])
+            df = df.loc[~df.index.duplicated(keep='last')].sort_index()
+        self.write(symbol, interval, df, coverage)
+
+    @staticmethod
+    def df_to_table(df: pd.DataFrame, interval) -> pa.Table:
+        # klines of old csv files don't have the columns that the simulation adds
+        missing_values = {'interval': interval, 'minutes_interval': interval_minutes(interval), 'isClose': True}
+        columns = {}
+        for field in KLINE_SCHEMA:
+            if field.name == 'Close time':
+                values = _times_to_ms(df.index)
+            elif field.name not in df.columns:
+                values = [missing_values.get(field.name)] * len(df)
+            elif field.name == 'Open time':
+                values = _times_to_ms(df['Open time'])
+            else:
+                values = df[field.name].to_numpy()
+            columns[field.name] = pa.array(values, type=field.type)
+        return pa.Table.from_pydict(columns, schema=KLINE_SCHEMA)
+
+    @staticmethod
+    def table_to_df(table: pa.Table) -> pd.DataFrame:
+        df = table.to_pandas()
+        if 'Open time' in df.columns:
+            df['Open time'] = pd.to_datetime(df['Open time'], unit='ms')
+        df.index = pd.to_datetime(df.pop('Close time'), unit='ms')
+        return df
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from binance_bot_simulation.binance.kline_store import interval_minutes
+
+# columns of the klines that are summed when candles are joined
+SUM_COLUMNS = ['Volume',
+               'Quote asset volume',
+               'Number of trades',
+               'Taker buy base asset volume',
+               'Taker buy quote asset volume']
+
+
+def _interval_open_times(open_times: pd.Series, interval: str) -> np.ndarray:
+    """
+    :return: array of datetime64[ms] of the open time of the interval candle that each of open_times is inside of it
+    """
+    if interval[-1] == 'M':
+        return open_times.dt.to_period('M').dt.start_time.to_numpy(dtype='datetime64[ms]')
+    ms = open_times.to_numpy(dtype='datetime64[ms]').view(np.int64)
+    interval_ms = interval_minutes(interval) * 60 * 1000
+    # weekly candles open on monday, 3 days before the epoch
+    offset = 3 * 24 * 60 * 60 * 1000 if interval[-1] == 'w' else 0
+    return ((ms + offset) // interval_ms * interval_ms - offset).view('datetime64[ms]')
+
+
+def _interval_close_times(interval_open_times: np.ndarray, interval: str) -> np.ndarray:
+    if interval[-1] == 'M':
+        months = interval_open_times.astype('datetime64[M]') + 1
+        return months.astype('datetime64[ms]')
+    return interval_open_times + np.timedelta64(interval_minutes(interval), 'm')
+
+
+def resample_klines(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Build candles of a higher interval from candles of a lower interval, for example 4h candles from 1m candles.
+    Candles that don't have all of the candles of df inside them (the first and the last candles usually, and candles
+    with a gap in the data) are dropped.
+    :param df: klines DataFrame indexed by 'Close time', sorted by time, as `change_df_types` returns
+    :param interval: the interval to build
+    :return: klines DataFrame with the same columns and types as downloaded klines of interval
+    """
+    if len(df) == 0:
+        return df.assign(interval=interval, minutes_interval=interval_minutes(interval))
+    interval_open_times = _interval_open_times(df['Open time'], interval)
+    starts = np.flatnonzero(np.r_[True, interval_open_times[1:] != interval_open_times[:-1]])
+    ends = np.r_[starts[1:], len(df)] - 1
+
+    interval_open_times = interval_open_times[starts]
+    interval_close_times = _interval_close_times(interval_open_times, interval)
+    # a candle is complete when it has all of the lower interval candles inside it, candles with missing candles
+    # in the middle of them (like exchange downtime) are dropped too
+    base_interval = df.index[0] - df['Open time'].iloc[0]
+    expected_counts = (interval_close_times - interval_open_times) // base_interval.to_timedelta64()
+    complete = ((df['Open time'].to_numpy(dtype='datetime64[ms]')[starts] == interval_open_times) &
+                (df.index.to_numpy(dtype='datetime64[ms]')[ends] == interval_close_times) &
+                (ends - starts + 1 == expected_counts))
+
+    resampled = {
+        'Open time': interval_open_times,
+        'Open': df['Open'].to_numpy()[starts],
+        'High': np.maximum.reduceat(df['High'].to_numpy(), starts),
+        'Low': np.minimum.reduceat(df['Low'].to_numpy(), starts),
+        'Close': df['Close'].to_numpy()[ends],
+    }
+    for column in SUM_COLUMNS:
+        resampled[column] = np.add.reduceat(df[column].to_numpy(), starts)
+    resampled_df = pd.DataFrame(resampled, index=pd.DatetimeIndex(interval_close_times, name='Close time'))
+    resampled_df = resampled_df[list(df.columns.intersection(resampled_df.columns, sort=False))]
+    resampled_df['Coin'] = df['Coin'].iloc[0]
+    resampled_df['interval'] = interval
+    resampled_df['minutes_interval'] = interval_minutes(interval)
+    resampled_df['isClose'] = True
+    return resampled_df.loc[complete]
@@ -0,0 +1,141 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+
+class EventLedger:
+    """
+    History of the portfolio state that is kept as a log of changes instead of a row for each timestamp.
+    When a timestamp ends only the values that changed in it are logged (the price of the candle coin on a tick, the
+    amounts and the balances on a fill), and a full row is saved as a checkpoint once in a while.
+    The rows of the history are rebuilt with numpy when they are asked for, from the nearest checkpoint before them.
+    It has the same interface as Ledger, so the portfolio can use any of them.
+    """
+
+    INITIAL_CAPACITY = 1024
+    # number of logged changes between checkpoints, the most changes that rebuilding rows has to go over before them
+    CHECKPOINT_CHANGES = 4096
+
+    def __init__(self, timestamp, **values):
+        """
+        :param timestamp: the time of the first row
+        :param values: key-arg of the columns names and their values in the first row
+        """
+        self.columns = list(values.keys())
+        self.column_index = {column: i for i, column in enumerate(self.columns)}
+        # the last row, it is not logged until the next row starts
+        self.current = np.array(list(values.values()), dtype=np.float64)
+        self.__logged = self.current.copy()
+        self.last_time = timestamp
+
+        self.__times = np.empty(EventLedger.INITIAL_CAPACITY, dtype=np.int64)
+        self.__times[0] = pd.Timestamp(timestamp).value
+        self.__length = 1
+
+        self.__change_rows = np.empty(EventLedger.INITIAL_CAPACITY, dtype=np.int32)
+        self.__change_columns = np.empty(EventLedger.INITIAL_CAPACITY, dtype=np.int16)
+        self.__change_values = np.empty(EventLedger.INITIAL_CAPACITY, dtype=np.float64)
+        self.__changes = 0
+
+        # checkpoint i is the state after the first __checkpoint_changes[i] changes
+        self.__checkpoint_changes = [0]
+        self.__checkpoint_values = [self.current.copy()]
+
+    def __len__(self):
+        return self.__length
+
+    def __getitem__(self, column):
+        """
+        :return: the last value of column
+        """
+        return self.current[self.column_index[column]]
+
+    def __setitem__(self, column, value):
+        """
+        Set the value of column in the last row
+        """
+        self.current[self.column_index[column]] = value
+
+    def new_row(self, timestamp):
+        """
+        Add a row for timestamp with the same values as the last row, if the last row is of timestamp already
+        it stays the last row.
+        """
+        if timestamp == self.last_time:
+            return
+        self.__log_current_row()
+        if self.__length == len(self.__times):
+            self.__times = EventLedger.__grown(self.__times, self.__length)
+        self.__times[self.__length] = timestamp.value
+        self.__length += 1
+        self.last_time = timestamp
+
+    def __log_current_row(self):
+        changed = np.flatnonzero(self.current != self.__logged)
+        if len(changed) == 0:
+            return
+        start = self.__changes
+        end = start + len(changed)
+        if end > len(self.__change_rows):
+            self.__change_rows = EventLedger.__grown(self.__change_rows, start, end)
+            self.__change_columns = EventLedger.__grown(self.__change_columns, start, end)
+            self.__change_values = EventLedger.__grown(self.__change_values, start, end)
+        self.__change_rows[start:end] = self.__length - 1
+        self.__change_columns[start:end] = changed
+        self.__change_values[start:end] = self.current[changed]
+        self.__logged[changed] = self.current[changed]
+        self.__changes = end
+
+        if end - self.__checkpoint_changes[-1] >= EventLedger.CHECKPOINT_CHANGES:
+            self.__checkpoint_changes.append(end)
+            self.__checkpoint_values.append(self.__logged.copy())
+
+    @staticmethod
+    def __grown(array, length, min_capacity=0):
+        grown = np.empty(max(2 * len(array), min_capacity), dtype=array.dtype)
+        grown[:length] = array[:length]
+        return grown
+
+    def __state_before(self, change):
+        """
+        :return: the values of the row state after the first `change` changes
+        """
+        checkpoint = bisect.bisect_right(self.__checkpoint_changes, change) - 1
+        values = self.__checkpoint_values[checkpoint].copy()
+        start = self.__checkpoint_changes[checkpoint]
+        # the last change of each column is the one that stays
+        columns = self.__change_columns[start:change][::-1]
+        columns, last = np.unique(columns, return_index=True)
+        values[columns] = self.__change_values[start:change][::-1][last]
+        return values
+
+    def __rebuild_rows(self, start, end):
+        """
+        :return: 2-D array of the values of the logged rows in [start, end)
+        """
+        change_rows = self.__change_rows[:self.__changes]
+        first_change, end_change = np.searchsorted(change_rows, [start, end])
+        base = self.__state_before(first_change)
+
+        rows = change_rows[first_change:end_change] - start
+        columns = self.__change_columns[first_change:end_change]
+        changes = np.empty((end - start, len(self.columns)), dtype=np.float64)
+        last_change_row = np.full((end - start, len(self.columns)), -1, dtype=np.int64)
+        # each row has at most one change of each column
+        changes[rows, columns] = self.__change_values[first_change:end_change]
+        last_change_row[rows, columns] = rows
+        np.maximum.accumulate(last_change_row, axis=0, out=last_change_row)
+        values = changes[np.maximum(last_change_row, 0), np.arange(len(self.columns))]
+        return np.where(last_change_row >= 0, values, base)
+
+    def to_frame(self, period=0) -> pd.DataFrame:
+        """
+        :param period: number of the last rows to take, 0 for all of the rows
+        :return: copy of the history as DataFrame indexed by the timestamps
+        """
+        start = max(self.__length - period, 0) if period > 0 else 0
+        values = np.vstack([self.__rebuild_rows(start, self.__length - 1), self.current])
+        return pd.DataFrame(values,
+                            index=pd.DatetimeIndex(self.__times[start:self.__length]),
+                            columns=self.columns)
@@ -1,53 +1,135 @@
+import asyncio
+import inspect
+
 from binance import Client
 from abc import ABC, abstractmethod
-from binance_bot_simulation.other.circular_queue import CircularQueue
+from binance_bot_simulation.exchange_bots.indicators import Indicator
+from binance_bot_simulation.exchange_bots.market_data import MarketData
 
 
 class ExchangeBot(ABC):
+    CANDLE_COLUMNS = MarketData.CANDLE_COLUMNS
+    OPEN, HIGH, LOW, CLOSE, VOLUME, TIME = range(len(CANDLE_COLUMNS))
 
-    def __init__(self, memory_length=500):
+    def __init__(self, memory_length=500, market_data: MarketData = None):
+        """
+        :param memory_length: the default number of the last candles that are kept for each coin/interval
+        :param market_data: market data that is shared with exchanges of other strategies, the candles are recorded
+                            in it by its owner and the exchange gets them with `on_candle`
+        """
         self.strategy = None
         self.portfolio = None
-        # history_data will be available only for prepare stage
-        self.history_data = {}
-        self.memory_length = memory_length
-        self.ohlc = {key: {} for key in ['Open', 'High', 'Low', 'Close']}
-        self.tasks = []
+        self.market_data = market_data if market_data is not None else MarketData(memory_length)
+        self.tasks = TaskQueue()
+        # the event loop that runs the coroutines of the synchronous methods
+        self.__loop = None
+
+    @property
+    def history_data(self):
+        return self.market_data.history_data
+
+    @history_data.setter
+    def history_data(self, history_data):
+        self.market_data.history_data = history_data
+
+    @property
+    def candles(self):
+        return self.market_data.candles
+
+    @property
+    def indicators(self):
+        return self.market_data.indicators
 
     def set_strategy(self, strategy):
         self.strategy = strategy
         self.strategy.set_exchange(self)
+        self.market_data.add_lookbacks(strategy.get_lookbacks())
+        # the portfolio can be created before the strategy, the strategy decides which coin is the quoted one
+        if self.portfolio is not None:
+            self.portfolio.metrics.quoted = strategy.quoted
+
+    def lookback(self, interval):
+        """
+        :return: number of the last candles of interval that are kept
+        """
+        return self.market_data.lookback(interval)
 
     def add_history(self, coin, interval, history_data):
-        if coin not in self.history_data:
-            self.history_data[coin] = {}
-        self.history_data[coin][interval] = history_data
-
-        # { 'Open' :
-        #           { coin :
-        #                    { interval : []
-        #                      ...
-        #                    }
-        #             ...
-        #           }
-        #    ...
-        # }
-        for key in self.ohlc.keys():
-            if coin not in self.ohlc[key]:
-                self.ohlc[key][coin] = {}
-            self.ohlc[key][coin][interval] = CircularQueue(history_data[key].values, self.memory_length)
+        self.market_data.add_history(coin, interval, history_data)
+
+    @staticmethod
+    def candle_rows(df):
+        return MarketData.candle_rows(df)
+
+    def register_indicator(self, name, coin, interval, indicator: Indicator):
+        """
+        See `MarketData.register_indicator`
+        """
+        return self.market_data.register_indicator(name, coin, interval, indicator)
+
+    def indicator(self, name, coin, interval, klines=None):
+        """
+        :param klines: number of the last values to return, if None only the current value
+        :return: the current value of the indicator, or read-only view of its last `klines` values
+        """
+        return self.market_data.indicator(name, coin, interval, klines)
 
     async def start(self):
-        await self.strategy.prepare_strategy()
-        # free a lot of ram
-        self.history_data = None
+        await self.prepare_strategy()
+        self.market_data.release_history()
+
+    def start_sync(self):
+        """
+        Same as `start` but without an event loop, prepare_strategy can still be a coroutine.
+        """
+        self.prepare_strategy_sync()
+        self.market_data.release_history()
+
+    async def prepare_strategy(self):
+        prepared = self.strategy.prepare_strategy()
+        if inspect.isawaitable(prepared):
+            await prepared
+
+    def prepare_strategy_sync(self):
+        prepared = self.strategy.prepare_strategy()
+        if inspect.isawaitable(prepared):
+            self._run_sync(prepared)
+
+    def _run_sync(self, awaitable):
+        """
+        Run a coroutine to its end from synchronous code, all of the coroutines of the exchange run on the same
+        event loop, so objects that are bound to a loop (like client sessions) can be used by all of them
+        """
+        if self.__loop is None:
+            self.__loop = asyncio.new_event_loop()
+        return self.__loop.run_until_complete(awaitable)
 
     async def record_candle(self, interval, candle):
-        [self.ohlc[key][candle['Coin']][interval].enqueue(candle[key]) for key in self.ohlc]
+        self.market_data.record(interval, candle)
+        await self.on_candle(interval, candle)
+
+    def record_candle_sync(self, interval, candle):
+        """
+        Same as `record_candle` without an event loop, the orders are set with `_set_order_sync`.
+        """
+        self.market_data.record(interval, candle)
+        self.on_candle_sync(interval, candle)
+
+    async def on_candle(self, interval, candle):
+        """
+        Handle a candle that was already recorded in the market data
+        """
+        self._on_candle(interval, candle)
+        await self.update(candle)
+
+    def on_candle_sync(self, interval, candle):
+        self._on_candle(interval, candle)
+        self.update_sync(candle)
+
+    def _on_candle(self, interval, candle):
         self.portfolio.update_history(candle['Close time'], candle)
 
         self.strategy.candle_close(interval, candle)
-        await self.update(candle)
 
     @property
     @abstractmethod
@@ -58,7 +140,10 @@ class ExchangeBot(ABC):
         pass
 
     @abstractmethod
-    def update_orders(self, timestamp, price: float):
+    def update_orders(self, candle):
+        """
+        Update the open orders after the candle closed
+        """
         pass
 
     @abstractmethod
@@ -69,6 +154,16 @@ class ExchangeBot(ABC):
     def _close_future_position(self, timestamp, coin, size, curr_price):
         pass
 
+    def _set_order_sync(self, order):
+        """
+        Same as `_set_order` for the synchronous loop, exchanges that can set orders without awaiting override it,
+        by default `_set_order` is run to its end
+        """
+        self._run_sync(self._set_order(order))
+
+    def _close_future_position_sync(self, timestamp, coin, size, curr_price):
+        self._run_sync(self._close_future_position(timestamp, coin, size, curr_price))
+
     def cancel_all_orders(self, timestamp):
         """
          cancel all open orders and notify the strategy.
@@ -81,10 +176,9 @@ class ExchangeBot(ABC):
             return
         if (size is None and percent is None) or (size is not None and percent is not None):
             percent = 1
-        position_size = self.portfolio.future_positions[symbol] * percent
         if percent is not None:
-            size = position_size * percent
-        self.tasks.append(ExchangeTask(ExchangeTask.CLOSE_FUTURE_POSITION, symbol=symbol, size=size))
+            size = self.portfolio.future_positions.position_size(symbol) * percent
+        self.tasks.add_close_future_position(symbol, size)
 
     def set_order(self, order):
         """
@@ -93,28 +187,71 @@ class ExchangeBot(ABC):
         """
         if order.price * order.amount < 20:
             return
-        self.tasks.append(ExchangeTask(ExchangeTask.ORDER, order=order))
+        self.tasks.add_order(order)
 
     async def update(self, candle):
         for task in self.tasks:
             if task.type == ExchangeTask.ORDER:
-                await self._set_order(task['order'])
+                await self._set_order(task.order)
+            elif task.type == ExchangeTask.CLOSE_FUTURE_POSITION:
+                await self._close_future_position(candle['Close time'], task.symbol, task.size,
+                                                  self.portfolio.future_positions.mark_price(task.symbol))
+        self.tasks.clear()
+        self.update_orders(candle)
+
+    def update_sync(self, candle):
+        for task in self.tasks:
+            if task.type == ExchangeTask.ORDER:
+                self._set_order_sync(task.order)
             elif task.type == ExchangeTask.CLOSE_FUTURE_POSITION:
-                await self._close_future_position(candle['Close time'], task['coin'], task['size'], candle['Close'])
-        self.tasks = []
-        self.update_orders(candle['Close time'], candle['Close'])
+                self._close_future_position_sync(candle['Close time'], task.symbol, task.size,
+                                                 self.portfolio.future_positions.mark_price(task.symbol))
+        self.tasks.clear()
+        self.update_orders(candle)
+
+    def memoized(self, coin, interval, function, *params):
+        """
+        Compute a value of the current candle of coin/interval once, the next calls with the same function and params
+        return the same value until the next candle of coin/interval.
+        The values are kept in the market data, so exchanges that share it share the values too, the function should
+        depend only on the market data.
+        :param function: function of (exchange, coin, interval, *params) that computes the value
+        :param params: hashable params of the function
+        :return: the value of the function
+        """
+        return self.market_data.memoized(coin, interval, (function, params),
+                                         lambda: function(self, coin, interval, *params))
 
-    def open(self, coin, interval, klines):
-        return self.ohlc['Open'][coin][interval][:-klines]
+    def candles_window(self, coin, interval, klines=1):
+        """
+        :return: read-only view of the last `klines` candles of coin/interval, a row for each candle with the values
+                 of CANDLE_COLUMNS
+        """
+        return self.market_data.candles_window(coin, interval, klines)
+
+    def open(self, coin, interval, klines=1):
+        """
+        :return: read-only view of the open prices of the last `klines` candles of coin/interval
+        """
+        return self.market_data.open(coin, interval, klines)
 
     def high(self, coin, interval, klines=1):
-        return self.ohlc['High'][coin][interval][:-klines]
+        return self.market_data.high(coin, interval, klines)
 
     def low(self, coin, interval, klines=1):
-        return self.ohlc['Low'][coin][interval][:-klines]
+        return self.market_data.low(coin, interval, klines)
 
     def close(self, coin, interval, klines=1):
-        return self.ohlc['Close'][coin][interval][:-klines]
+        return self.market_data.close(coin, interval, klines)
+
+    def volume(self, coin, interval, klines=1):
+        return self.market_data.volume(coin, interval, klines)
+
+    def times(self, coin, interval, klines=1):
+        """
+        :return: the close times of the last `klines` candles of coin/interval
+        """
+        return self.market_data.times(coin, interval, klines)
 
     def __str__(self):
         return str(self.portfolio)
@@ -124,9 +261,66 @@ class ExchangeTask:
     ORDER = 0
     CLOSE_FUTURE_POSITION = 1
 
-    def __init__(self, type, **kwargs):
+    __slots__ = ('type', 'order', 'symbol', 'size')
+
+    def __init__(self, type, order=None, symbol=None, size=None):
         self.type = type
-        self.values = kwargs
+        self.order = order
+        self.symbol = symbol
+        self.size = size
+
+    @property
+    def values(self):
+        if self.type == ExchangeTask.ORDER:
+            return {'order': self.order}
+        return {'symbol': self.symbol, 'size': self.size}
 
     def __getitem__(self, item):
-        return self.values[item]
+        return getattr(self, item)
+
+
+class TaskQueue:
+    """
+    Queue of the exchange tasks of a candle.
+    The task objects are kept after the queue is cleared and are used again for the next tasks, so placing orders on
+    every candle doesn't create new objects for them.
+    """
+
+    __slots__ = ('__tasks', '__length')
+
+    def __init__(self):
+        self.__tasks = []
+        self.__length = 0
+
+    def __len__(self):
+        return self.__length
+
+    def __iter__(self):
+        i = 0
+        # tasks that are added while the queue is handled are handled too
+        while i < self.__length:
+            yield self.__tasks[i]
+            i += 1
+
+    def __next_task(self, type):
+        if self.__length == len(self.__tasks):
+            self.__tasks.append(ExchangeTask(type))
+        task = self.__tasks[self.__length]
+        task.type = type
+        self.__length += 1
+        return task
+
+    def add_order(self, order):
+        task = self.__next_task(ExchangeTask.ORDER)
+        task.order = order
+
+    def add_close_future_position(self, symbol, size):
+        task = self.__next_task(ExchangeTask.CLOSE_FUTURE_POSITION)
+        task.symbol = symbol
+        task.size = size
+
+    def clear(self):
+        for i in range(self.__length):
+            # don't keep the orders alive after they were handled
+            self.__tasks[i].order = None
+        self.__length = 0
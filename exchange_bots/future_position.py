@@ -1,8 +1,14 @@
+import itertools
+
+
 class FuturePositions:
-    __ID = 0
+    __ids = itertools.count()
     SHORT = -1
     LONG = 1
 
+    __slots__ = ('id', 'timestamp', 'contract', 'entry_price', 'margin', 'position', 'size', 'leverage',
+                 'liquid_price', 'targets', 'stop_loss')
+
     def __init__(self, timestamp,
                  contract,
                  size,
@@ -11,8 +17,7 @@ class FuturePositions:
                  leverage,
                  targets: callable = None,
                  stop_loss: callable = None):
-        self.id = FuturePositions.__ID
-        FuturePositions.__ID += 1
+        self.id = next(FuturePositions.__ids)
         self.timestamp = timestamp
         self.contract = contract
         self.entry_price = entry_price
@@ -0,0 +1,159 @@
+import numpy as np
+
+from binance_bot_simulation.exchange_bots.future_position import FuturePositions
+
+
+class FuturePositionBook:
+    """
+    The open future positions of a portfolio, one position for each symbol.
+    The positions are kept in numpy arrays with a slot for each symbol, together with the mark price and the candle
+    range of the symbol, so the unrealized pnl and the liquidation of all of the positions are computed in one pass.
+    A closed position keeps its slot with size 0 until the symbol is opened again.
+    """
+
+    INITIAL_CAPACITY = 16
+
+    def __init__(self):
+        self.__slots = {}
+        self.__coin_slots = {}
+        self.symbols = []
+        capacity = FuturePositionBook.INITIAL_CAPACITY
+        self.size = np.zeros(capacity, dtype=np.float64)
+        self.entry_price = np.zeros(capacity, dtype=np.float64)
+        self.leverage = np.ones(capacity, dtype=np.float64)
+        self.side = np.zeros(capacity, dtype=np.int8)
+        self.margin = np.zeros(capacity, dtype=np.float64)
+        self.liquidation_price = np.zeros(capacity, dtype=np.float64)
+        self.mark = np.zeros(capacity, dtype=np.float64)
+        self.low = np.zeros(capacity, dtype=np.float64)
+        self.high = np.zeros(capacity, dtype=np.float64)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.size[:len(self.symbols)]))
+
+    def __contains__(self, symbol):
+        """
+        :return: true if there is an open position of symbol
+        """
+        slot = self.__slots.get(symbol)
+        return slot is not None and self.size[slot] > 0
+
+    def __slot(self, symbol, coin):
+        slot = self.__slots.get(symbol)
+        if slot is None:
+            slot = len(self.symbols)
+            if slot == len(self.size):
+                self.__grow()
+            self.__slots[symbol] = slot
+            self.__coin_slots.setdefault(coin, []).append(slot)
+            self.symbols.append(symbol)
+        return slot
+
+    def __grow(self):
+        for name in ['size', 'entry_price', 'leverage', 'side', 'margin', 'liquidation_price', 'mark', 'low', 'high']:
+            array = getattr(self, name)
+            grown = np.zeros(2 * len(array), dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def open(self, symbol, coin, size, entry_price, side, leverage):
+        """
+        Open a new position of symbol instead of its closed position
+        :param symbol: the contract symbol
+        :param coin: the coin that its candles mark the contract
+        :param side: FuturePositions.LONG or FuturePositions.SHORT
+        :return: the margin that the position takes from the wallet
+        """
+        slot = self.__slot(symbol, coin)
+        self.leverage[slot] = leverage
+        self.side[slot] = side
+        self.size[slot] = 0
+        self.margin[slot] = 0
+        margin = self.increase(symbol, size, entry_price)
+        self.mark[slot] = self.low[slot] = self.high[slot] = entry_price
+        return margin
+
+    def increase(self, symbol, size, price):
+        """
+        Make the position of symbol bigger, its entry price become the average price of its size
+        :return: the margin that the added size takes from the wallet, its value divided by the leverage
+        """
+        slot = self.__slots[symbol]
+        total_size = self.size[slot] + size
+        self.entry_price[slot] = (self.entry_price[slot] * self.size[slot] + price * size) / total_size
+        self.size[slot] = total_size
+        margin = size * price / self.leverage[slot]
+        self.margin[slot] += margin
+        self.liquidation_price[slot] = self.entry_price[slot] * (1 - self.side[slot] / self.leverage[slot])
+        return margin
+
+    def close(self, symbol, size, mark_price):
+        """
+        Close a part of the position of symbol
+        :param size: the size to close, at most the size of the position
+        :param mark_price: the price that the position is closed in
+        :return: the profit / lose of the closed size, and its margin
+        """
+        slot = self.__slots[symbol]
+        position_size = self.size[slot]
+        if size > position_size:
+            size = position_size
+        if position_size == 0:
+            return 0, 0
+        margin = self.margin[slot] * size / position_size
+        self.margin[slot] -= margin
+        self.size[slot] = position_size - size
+        return (mark_price - self.entry_price[slot]) * size * self.side[slot], margin
+
+    def position_size(self, symbol):
+        slot = self.__slots.get(symbol)
+        return 0 if slot is None else self.size[slot]
+
+    def position_side(self, symbol):
+        return self.side[self.__slots[symbol]]
+
+    def position_leverage(self, symbol):
+        return self.leverage[self.__slots[symbol]]
+
+    def mark_price(self, symbol):
+        return self.mark[self.__slots[symbol]]
+
+    def update_marks(self, candle):
+        """
+        Set the mark price and the range of the contracts of the candle coin
+        """
+        for slot in self.__coin_slots.get(candle['Coin'], ()):
+            self.mark[slot] = candle['Close']
+            self.low[slot] = candle['Low']
+            self.high[slot] = candle['High']
+
+    def liquidate(self):
+        """
+        Close the positions that their liquidation price was reached in the last candle range of their coin,
+        with the low of the candle for long positions and the high for short positions
+        :return: the symbols of the liquidated positions and their lost margins
+        """
+        n = len(self.symbols)
+        if n == 0:
+            return [], []
+        size = self.size[:n]
+        side = self.side[:n]
+        liquidation_price = self.liquidation_price[:n]
+        liquidated = np.flatnonzero((size > 0) & (
+                ((side == FuturePositions.LONG) & (self.low[:n] <= liquidation_price)) |
+                ((side == FuturePositions.SHORT) & (self.high[:n] >= liquidation_price))))
+        if len(liquidated) == 0:
+            return [], []
+        margins = self.margin[liquidated].tolist()
+        self.size[liquidated] = 0
+        self.margin[liquidated] = 0
+        return [self.symbols[slot] for slot in liquidated], margins
+
+    def unrealized_pnl(self):
+        """
+        :return: the sum of the profit / lose of all of the positions in their mark prices
+        """
+        n = len(self.symbols)
+        if n == 0:
+            return 0
+        return float(np.dot((self.mark[:n] - self.entry_price[:n]) * self.side[:n], self.size[:n]))
@@ -0,0 +1,209 @@
+import math
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from binance_bot_simulation.other.circular_queue import CircularQueue
+
+# the columns of the candle rows that the exchange keeps and the indicators get, the close time is in milliseconds
+CANDLE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Close time']
+OPEN, HIGH, LOW, CLOSE, VOLUME, TIME = range(len(CANDLE_COLUMNS))
+
+
+class Indicator(ABC):
+    """
+    Indicator that is updated with each new candle in O(1), without going over the candles before it.
+    The value is NaN until the indicator has enough candles.
+    """
+
+    # names of the values of indicators that have more than one value for a candle
+    COLUMNS = None
+
+    def __init__(self, memory_length=500):
+        """
+        :param memory_length: number of the last values that are kept for windows
+        """
+        empty = np.empty(0) if self.COLUMNS is None else np.empty((0, len(self.COLUMNS)))
+        self.values = CircularQueue(empty, memory_length)
+        self.value = math.nan if self.COLUMNS is None else (math.nan,) * len(self.COLUMNS)
+
+    def add(self, candle):
+        """
+        :param candle: row of the values of CANDLE_COLUMNS
+        """
+        self.value = self._next(candle)
+        self.values.enqueue(self.value)
+
+    def warm(self, candles):
+        """
+        :param candles: 2-D array of the candles before the simulation, a row of CANDLE_COLUMNS for each one
+        """
+        for candle in candles:
+            self.add(candle)
+
+    @abstractmethod
+    def _next(self, candle):
+        """
+        :return: the value of the indicator after the candle
+        """
+        pass
+
+
+class RollingSum:
+    """
+    Sum of the last `period` values, the sum is computed again from the values each time that the ring goes around
+    so the rounding errors don't add up.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.ring = [0.0] * period
+        self.index = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.sum += value - self.ring[self.index]
+        self.ring[self.index] = value
+        self.index += 1
+        if self.index == self.period:
+            self.index = 0
+            self.sum = math.fsum(self.ring)
+        if self.count < self.period:
+            self.count += 1
+
+    @property
+    def full(self):
+        return self.count == self.period
+
+
+class SMA(Indicator):
+
+    def __init__(self, period, source='Close', memory_length=500):
+        """
+        :param period: number of candles of the average
+        :param source: the column of the candles to average
+        """
+        super().__init__(memory_length)
+        self.column = CANDLE_COLUMNS.index(source)
+        self.sum = RollingSum(period)
+
+    def _next(self, candle):
+        self.sum.add(candle[self.column])
+        return self.sum.sum / self.sum.period if self.sum.full else math.nan
+
+
+class EMA(Indicator):
+
+    def __init__(self, period, source='Close', memory_length=500):
+        """
+        :param period: number of candles of the average, the first value is the simple average of `period` candles
+        :param source: the column of the candles to average
+        """
+        super().__init__(memory_length)
+        self.column = CANDLE_COLUMNS.index(source)
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.count = 0
+        self.ema = 0.0
+
+    def _next(self, candle):
+        value = candle[self.column]
+        if self.count < self.period:
+            self.count += 1
+            self.ema += (value - self.ema) / self.count
+            return self.ema if self.count == self.period else math.nan
+        self.ema += self.alpha * (value - self.ema)
+        return self.ema
+
+
+class WilderAverage:
+    """
+    Wilder's smoothing, the first value is the simple average of `period` values
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self.average = 0.0
+
+    def add(self, value):
+        if self.count < self.period:
+            self.count += 1
+            self.average += (value - self.average) / self.count
+        else:
+            self.average += (value - self.average) / self.period
+
+    @property
+    def full(self):
+        return self.count == self.period
+
+
+class RSI(Indicator):
+
+    def __init__(self, period=14, source='Close', memory_length=500):
+        super().__init__(memory_length)
+        self.column = CANDLE_COLUMNS.index(source)
+        self.gains = WilderAverage(period)
+        self.losses = WilderAverage(period)
+        self.last = None
+
+    def _next(self, candle):
+        value = candle[self.column]
+        last, self.last = self.last, value
+        if last is None:
+            return math.nan
+        change = value - last
+        self.gains.add(max(change, 0.0))
+        self.losses.add(max(-change, 0.0))
+        if not self.gains.full:
+            return math.nan
+        if self.losses.average == 0:
+            return 100.0 if self.gains.average > 0 else 50.0
+        return 100 - 100 / (1 + self.gains.average / self.losses.average)
+
+
+class ATR(Indicator):
+
+    def __init__(self, period=14, memory_length=500):
+        super().__init__(memory_length)
+        self.true_ranges = WilderAverage(period)
+        self.last_close = None
+
+    def _next(self, candle):
+        high = candle[HIGH]
+        low = candle[LOW]
+        if self.last_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self.last_close), abs(low - self.last_close))
+        self.last_close = candle[CLOSE]
+        self.true_ranges.add(true_range)
+        return self.true_ranges.average if self.true_ranges.full else math.nan
+
+
+class BollingerBands(Indicator):
+    COLUMNS = ('Middle', 'Upper', 'Lower')
+
+    def __init__(self, period=20, deviations=2, source='Close', memory_length=500):
+        """
+        :param period: number of candles of the average and the standard deviation
+        :param deviations: the distance of the bands from the average in standard deviations
+        """
+        super().__init__(memory_length)
+        self.column = CANDLE_COLUMNS.index(source)
+        self.deviations = deviations
+        self.sum = RollingSum(period)
+        self.squares_sum = RollingSum(period)
+
+    def _next(self, candle):
+        value = candle[self.column]
+        self.sum.add(value)
+        self.squares_sum.add(value * value)
+        if not self.sum.full:
+            return math.nan, math.nan, math.nan
+        period = self.sum.period
+        mean = self.sum.sum / period
+        deviation = math.sqrt(max(self.squares_sum.sum / period - mean * mean, 0.0)) * self.deviations
+        return mean, mean + deviation, mean - deviation
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+
+class Ledger:
+    """
+    History of the portfolio state, a row for each timestamp and a column for each value of the state.
+    The rows are kept in a preallocated numpy table that doubles its size when it is full, a new row starts as a copy of
+    the last one and then it is updated in place, the DataFrame of the history is created only when it is asked for.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, timestamp, **values):
+        """
+        :param timestamp: the time of the first row
+        :param values: key-arg of the columns names and their values in the first row
+        """
+        self.columns = list(values.keys())
+        self.column_index = {column: i for i, column in enumerate(self.columns)}
+        self.__values = np.empty((Ledger.INITIAL_CAPACITY, len(self.columns)), dtype=np.float64)
+        self.__times = np.empty(Ledger.INITIAL_CAPACITY, dtype=np.int64)
+        self.__length = 1
+        self.__values[0] = list(values.values())
+        self.__times[0] = pd.Timestamp(timestamp).value
+        self.last_time = timestamp
+        # view of the last row
+        self.current = self.__values[0]
+
+    def __len__(self):
+        return self.__length
+
+    def __getitem__(self, column):
+        """
+        :return: the last value of column
+        """
+        return self.current[self.column_index[column]]
+
+    def __setitem__(self, column, value):
+        """
+        Set the value of column in the last row
+        """
+        self.current[self.column_index[column]] = value
+
+    def new_row(self, timestamp):
+        """
+        Add a row for timestamp with the same values as the last row, if the last row is of timestamp already
+        it stays the last row.
+        """
+        if timestamp == self.last_time:
+            return
+        if self.__length == len(self.__times):
+            self.__grow()
+        self.__values[self.__length] = self.__values[self.__length - 1]
+        self.__times[self.__length] = timestamp.value
+        self.current = self.__values[self.__length]
+        self.__length += 1
+        self.last_time = timestamp
+
+    def __grow(self):
+        capacity = 2 * len(self.__times)
+        values = np.empty((capacity, len(self.columns)), dtype=np.float64)
+        values[:self.__length] = self.__values[:self.__length]
+        times = np.empty(capacity, dtype=np.int64)
+        times[:self.__length] = self.__times[:self.__length]
+        self.__values = values
+        self.__times = times
+        self.current = self.__values[self.__length - 1]
+
+    def to_frame(self, period=0) -> pd.DataFrame:
+        """
+        :param period: number of the last rows to take, 0 for all of the rows
+        :return: copy of the history as DataFrame indexed by the timestamps
+        """
+        start = max(self.__length - period, 0) if period > 0 else 0
+        return pd.DataFrame(self.__values[start:self.__length].copy(),
+                            index=pd.DatetimeIndex(self.__times[start:self.__length]),
+                            columns=self.columns)
@@ -0,0 +1,179 @@
+import numpy as np
+
+from binance_bot_simulation.exchange_bots import indicators
+from binance_bot_simulation.exchange_bots.indicators import Indicator
+from binance_bot_simulation.other.circular_queue import CircularQueue
+
+
+class MarketData:
+    """
+    The candles that the exchange received, the indicators over them and the memoized values of the current candles.
+    The market data doesn't depend on the strategy or on the portfolio, so exchanges of several strategies over the
+    same candles can share one market data object, and each candle is recorded in it once for all of them.
+    """
+
+    CANDLE_COLUMNS = indicators.CANDLE_COLUMNS
+    OPEN, HIGH, LOW, CLOSE, VOLUME, TIME = range(len(CANDLE_COLUMNS))
+    # max number of memoized values of a coin/interval candle
+    MAX_MEMOIZED = 256
+
+    def __init__(self, memory_length=500):
+        """
+        :param memory_length: the default number of the last candles that are kept for each coin/interval
+        """
+        # history_data will be available only for prepare stage
+        self.history_data = {}
+        self.memory_length = memory_length
+        # the lookbacks of the strategies that read the market data, see `Strategy.get_lookbacks`
+        self.strategies_lookbacks = []
+        # the last candles of each (coin, interval) as rows of CANDLE_COLUMNS
+        self.candles = {}
+        # the indicators of each (coin, interval) by their names
+        self.indicators = {}
+        # the memoized values of the current candle of each (coin, interval)
+        self.memoized_values = {}
+
+    def lookback(self, interval):
+        """
+        :return: number of the last candles of interval that are kept, the most that any of the strategies needs
+        """
+        if not self.strategies_lookbacks:
+            return self.memory_length
+        return max(lookbacks.get(interval, self.memory_length) for lookbacks in self.strategies_lookbacks)
+
+    def add_lookbacks(self, lookbacks):
+        """
+        :param lookbacks: the lookbacks of a new strategy that reads the market data
+        """
+        for interval, lookback in lookbacks.items():
+            if lookback < 1:
+                raise ValueError(f'The lookback of {interval} must be at least 1 candle ({lookback})')
+        self.strategies_lookbacks.append(lookbacks)
+        # size again the candles that were added before the strategy
+        for (coin, interval), candles in self.candles.items():
+            if self.history_data and interval in self.history_data.get(coin, {}):
+                candles = MarketData.candle_rows(self.history_data[coin][interval])
+            else:
+                candles = candles.to_array()
+            self.candles[coin, interval] = CircularQueue(candles, self.lookback(interval))
+
+    def add_history(self, coin, interval, history_data):
+        if coin not in self.history_data:
+            self.history_data[coin] = {}
+        self.history_data[coin][interval] = history_data
+
+        self.candles[coin, interval] = CircularQueue(MarketData.candle_rows(history_data), self.lookback(interval))
+
+    def release_history(self):
+        """
+        Drop the history data after the strategies were prepared, the candles that are kept stay
+        """
+        # free a lot of ram
+        self.history_data = None
+
+    @staticmethod
+    def candle_rows(df):
+        """
+        :param df: klines DataFrame indexed by 'Close time'
+        :return: 2-D array of the candles, a row of CANDLE_COLUMNS for each one
+        """
+        candles = np.empty((len(df), len(MarketData.CANDLE_COLUMNS)), dtype=np.float64)
+        candles[:, :MarketData.TIME] = df[MarketData.CANDLE_COLUMNS[:MarketData.TIME]].to_numpy(np.float64)
+        candles[:, MarketData.TIME] = df.index.to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        return candles
+
+    def record(self, interval, candle):
+        """
+        Add the candle to the candles of its coin/interval and update their indicators
+        """
+        key = (candle['Coin'], interval)
+        row = (candle['Open'],
+               candle['High'],
+               candle['Low'],
+               candle['Close'],
+               candle['Volume'],
+               candle['Close time'].value // 1_000_000)
+        self.candles[key].enqueue(row)
+        self.memoized_values.pop(key, None)
+        if key in self.indicators:
+            for indicator in self.indicators[key].values():
+                indicator.add(row)
+
+    def register_indicator(self, name, coin, interval, indicator: Indicator):
+        """
+        Add an indicator of coin/interval that is updated with each of its candles, it is warmed with the history
+        of coin/interval so register the indicators before the simulation starts, in `Strategy.prepare_strategy`.
+        The indicators are shared by the strategies, if an indicator with the name is already registered for
+        coin/interval it is returned and the new one is ignored, so give indicators with different parameters
+        different names.
+        :param name: the name to read the indicator with
+        :return: the indicator
+        """
+        registered = self.indicators.setdefault((coin, interval), {})
+        if name in registered:
+            return registered[name]
+        if self.history_data and interval in self.history_data.get(coin, {}):
+            indicator.warm(MarketData.candle_rows(self.history_data[coin][interval]))
+        else:
+            indicator.warm(self.candles[coin, interval].to_array())
+        registered[name] = indicator
+        return indicator
+
+    def indicator(self, name, coin, interval, klines=None):
+        """
+        :param klines: number of the last values to return, if None only the current value
+        :return: the current value of the indicator, or read-only view of its last `klines` values
+        """
+        indicator = self.indicators[coin, interval][name]
+        if klines is None:
+            return indicator.value
+        return indicator.values.last(klines)
+
+    def memoized(self, coin, interval, key, compute):
+        """
+        :param key: hashable key of the value in the current candle of coin/interval
+        :param compute: function without arguments that computes the value, it is called only if the value of key
+                        wasn't computed yet in the current candle
+        :return: the value of key
+        """
+        values = self.memoized_values.get((coin, interval))
+        if values is None:
+            values = self.memoized_values[coin, interval] = {}
+        if key in values:
+            return values[key]
+        value = compute()
+        if len(values) >= MarketData.MAX_MEMOIZED:
+            del values[next(iter(values))]
+        values[key] = value
+        return value
+
+    def candles_window(self, coin, interval, klines=1):
+        """
+        :return: read-only view of the last `klines` candles of coin/interval, a row for each candle with the values
+                 of CANDLE_COLUMNS
+        """
+        return self.candles[coin, interval].last(klines)
+
+    def open(self, coin, interval, klines=1):
+        """
+        :return: read-only view of the open prices of the last `klines` candles of coin/interval
+        """
+        return self.candles[coin, interval].last(klines)[:, MarketData.OPEN]
+
+    def high(self, coin, interval, klines=1):
+        return self.candles[coin, interval].last(klines)[:, MarketData.HIGH]
+
+    def low(self, coin, interval, klines=1):
+        return self.candles[coin, interval].last(klines)[:, MarketData.LOW]
+
+    def close(self, coin, interval, klines=1):
+        return self.candles[coin, interval].last(klines)[:, MarketData.CLOSE]
+
+    def volume(self, coin, interval, klines=1):
+        return self.candles[coin, interval].last(klines)[:, MarketData.VOLUME]
+
+    def times(self, coin, interval, klines=1):
+        """
+        :return: the close times of the last `klines` candles of coin/interval
+        """
+        return self.candles[coin, interval].last(klines)[:, MarketData.TIME].astype('datetime64[ms]')
@@ -0,0 +1,121 @@
+import math
+
+
+class PerformanceMetrics:
+    """
+    Performance statistics of a portfolio that are updated online, in O(1) for each tick and each fill.
+    The returns and the drawdown are of the portfolio worth between timestamps, the worth of a timestamp is final when
+    the next timestamp starts, so all of the candles that closed at the same time are in the same return, and the
+    states between them, with the new price of one coin and the old price of another, are not counted.
+    """
+
+    def __init__(self, start_worth, quoted='USDT'):
+        """
+        :param start_worth: the worth of the portfolio when it started
+        :param quoted: the coin that is not counted as exposure
+        """
+        self.quoted = quoted
+        self.start_worth = start_worth
+        self.equity = start_worth
+        self.peak_equity = start_worth
+        self.max_drawdown = 0
+        self.exposure = 0
+
+        self.turnover = 0
+        self.fees = 0
+        self.trades = 0
+        self.winning_trades = 0
+
+        self.__last_time = None
+        self.__last_equity = start_worth
+        # Welford's online mean and variance of the returns
+        self.__returns_count = 0
+        self.__returns_mean = 0
+        self.__returns_m2 = 0
+        self.__exposure_sum = 0
+
+    def on_tick(self, timestamp, worth, quoted_worth):
+        """
+        :param timestamp: the time of the tick
+        :param worth: the worth of the portfolio after the tick
+        :param quoted_worth: the worth of the quoted coin in the portfolio
+        """
+        if timestamp != self.__last_time:
+            if self.__last_time is not None:
+                self.__close_period()
+            self.__last_time = timestamp
+        self.equity = worth
+        self.exposure = 1 - quoted_worth / worth if worth != 0 else 0
+
+    def on_fill(self, notional, fee, pnl=None):
+        """
+        :param notional: the dollar value of the filled order
+        :param fee: the fee of the order as a fraction of its value
+        :param pnl: the profit or loss that the order realized, None if it didn't close anything
+        """
+        self.turnover += notional
+        self.fees += notional * fee
+        if pnl is not None:
+            self.trades += 1
+            if pnl > 0:
+                self.winning_trades += 1
+
+    def __close_period(self):
+        returns_count, returns_mean, returns_m2, exposure_sum = self.__stats_with_current_period()
+        self.__returns_count = returns_count
+        self.__returns_mean = returns_mean
+        self.__returns_m2 = returns_m2
+        self.__exposure_sum = exposure_sum
+        self.__last_equity = self.equity
+        self.peak_equity, self.max_drawdown = self.__drawdown_with_current_period()
+
+    def __drawdown_with_current_period(self):
+        """
+        :return: the peak equity and the max drawdown if the current period was closed now
+        """
+        if self.equity > self.peak_equity:
+            return self.equity, self.max_drawdown
+        if self.peak_equity > 0:
+            return self.peak_equity, max(self.max_drawdown, 1 - self.equity / self.peak_equity)
+        return self.peak_equity, self.max_drawdown
+
+    def __stats_with_current_period(self):
+        """
+        :return: the returns statistics if the current period was closed now
+        """
+        period_return = self.equity / self.__last_equity - 1 if self.__last_equity != 0 else 0
+        count = self.__returns_count + 1
+        delta = period_return - self.__returns_mean
+        mean = self.__returns_mean + delta / count
+        m2 = self.__returns_m2 + delta * (period_return - mean)
+        return count, mean, m2, self.__exposure_sum + self.exposure
+
+    def summary(self, periods_per_year=None):
+        """
+        :param periods_per_year: number of ticks in a year to annualize the volatility and sharpe ratio,
+                                 if None they are per tick
+        :return: dictionary of the performance statistics
+        """
+        if self.__last_time is None:
+            count, mean, m2, exposure_sum = 0, 0, 0, 0
+            max_drawdown = self.max_drawdown
+        else:
+            count, mean, m2, exposure_sum = self.__stats_with_current_period()
+            _, max_drawdown = self.__drawdown_with_current_period()
+        volatility = math.sqrt(m2 / (count - 1)) if count > 1 else 0
+        sharpe = mean / volatility if volatility > 0 else 0
+        if periods_per_year is not None:
+            volatility *= math.sqrt(periods_per_year)
+            sharpe *= math.sqrt(periods_per_year)
+        return {
+            'Equity': self.equity,
+            'Return': self.equity / self.start_worth - 1 if self.start_worth != 0 else 0,
+            'Max drawdown': max_drawdown,
+            'Volatility': volatility,
+            'Sharpe': sharpe,
+            'Exposure': exposure_sum / count if count > 0 else 0,
+            'Turnover': self.turnover / self.start_worth if self.start_worth != 0 else 0,
+            'Fees': self.fees,
+            'Trades': self.trades,
+            'Win rate': self.winning_trades / self.trades if self.trades > 0 else 0,
+        }
@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+class OrderBook:
+    """
+    Book of the filled orders of a portfolio.
+    Each column is kept in its own growable numpy array of a fixed type: the times as int64 nanoseconds, and the text
+    columns (coins, sides) as integer codes of categories, so the DataFrame and the Arrow table of the book are built
+    over the same arrays without copying them.
+    The orders are added in time order, so time ranges are found with binary search.
+    Like the list of orders that the book used to be, iterating it or indexing it by position gives the orders as
+    dictionaries, indexing it by a column name gives the array of the column.
+    """
+
+    INITIAL_CAPACITY = 1024
+    TIME_COLUMN = 'Time'
+
+    def __init__(self, **columns):
+        """
+        :param columns: key-arg of the columns names and their type, a numpy type, `str` for a text column that its
+                        categories are added when they show up, or a tuple of the fixed categories of the column
+        """
+        self.columns = list(columns.keys())
+        self.__length = 0
+        self.__arrays = {}
+        self.__categories = {}
+        for column, column_type in columns.items():
+            if column_type is str or isinstance(column_type, tuple):
+                categories = list(column_type) if isinstance(column_type, tuple) else []
+                self.__categories[column] = {category: code for code, category in enumerate(categories)}
+                dtype = np.int8 if isinstance(column_type, tuple) else np.int16
+            elif column == OrderBook.TIME_COLUMN:
+                dtype = np.int64
+            else:
+                dtype = column_type
+            self.__arrays[column] = np.empty(OrderBook.INITIAL_CAPACITY, dtype=dtype)
+
+    @staticmethod
+    def spot():
+        return OrderBook(**{'Id': np.int64,
+                            'Time': np.int64,
+                            'Coin': str,
+                            'Quoted Symbol': str,
+                            'Amount': np.float64,
+                            'Price': np.float64,
+                            'Side': ('BUY', 'SELL'),
+                            'filled': np.float64,
+                            'Percent': np.float64})
+
+    @staticmethod
+    def future():
+        return OrderBook(**{'Id': np.int64,
+                            'Time': np.int64,
+                            'Symbol': str,
+                            'Amount': np.float64,
+                            'Price': np.float64,
+                            'Side': ('LONG', 'SHORT'),
+                            'Filled': np.float64,
+                            'Percent': np.float64})
+
+    def __len__(self):
+        return self.__length
+
+    def append(self, order):
+        """
+        :param order: dictionary of the filled order, with value for each of the columns
+        """
+        if self.__length == len(self.__arrays[OrderBook.TIME_COLUMN]):
+            self.__grow()
+        for column, array in self.__arrays.items():
+            value = order[column]
+            if column in self.__categories:
+                categories = self.__categories[column]
+                if value not in categories:
+                    if array.dtype == np.int8:
+                        raise ValueError(f'Invalid value of {column} in order book ({value})')
+                    categories[value] = len(categories)
+                value = categories[value]
+            elif column == OrderBook.TIME_COLUMN:
+                value = value.value
+            elif value is None:
+                value = np.nan
+            array[self.__length] = value
+        self.__length += 1
+
+    def __grow(self):
+        for column, array in self.__arrays.items():
+            grown = np.empty(2 * len(array), dtype=array.dtype)
+            grown[:self.__length] = array[:self.__length]
+            self.__arrays[column] = grown
+
+    def __iter__(self):
+        for i in range(self.__length):
+            yield self.__order(i)
+
+    def __order(self, i):
+        """
+        :return: dictionary of the order in position i, with the same values that were appended
+        """
+        order = {}
+        for column in self.columns:
+            value = self.__arrays[column][i]
+            if column in self.__categories:
+                order[column] = self.categories(column)[value]
+            elif column == OrderBook.TIME_COLUMN:
+                order[column] = pd.Timestamp(int(value))
+            else:
+                order[column] = value.item()
+        return order
+
+    def __getitem__(self, key):
+        """
+        :param key: a column name, position of an order or a slice of positions
+        :return: read only numpy array of a column, the codes of the categories for text columns,
+                 the order of a position or the list of the orders of a slice
+        """
+        if isinstance(key, slice):
+            return [self.__order(i) for i in range(*key.indices(self.__length))]
+        if isinstance(key, (int, np.integer)):
+            if not -self.__length <= key < self.__length:
+                raise IndexError('order book index out of range')
+            return self.__order(key % self.__length)
+        column = key
+        array = self.__arrays[column][:self.__length]
+        if column == OrderBook.TIME_COLUMN:
+            array = array.view('datetime64[ns]')
+        array = array.view()
+        array.flags.writeable = False
+        return array
+
+    def categories(self, column):
+        """
+        :return: the categories of a text column, ordered by their codes
+        """
+        return list(self.__categories[column])
+
+    def code(self, column, category):
+        """
+        :return: the code of category in a text column, -1 if there are no orders with it
+        """
+        return self.__categories[column].get(category, -1)
+
+    def select(self, coin=None, side=None, start_time=None, end_time=None):
+        """
+        :param coin: take only orders of this coin, the 'Coin' column of spot books and 'Symbol' of future books
+        :param side: take only orders of this side
+        :param start_time: take only orders from this time
+        :param end_time: take only orders before this time
+        :return: new OrderBook of the orders that match
+        """
+        times = self.__arrays[OrderBook.TIME_COLUMN][:self.__length]
+        start = 0 if start_time is None else np.searchsorted(times, pd.Timestamp(start_time).value, side='left')
+        end = self.__length if end_time is None else np.searchsorted(times, pd.Timestamp(end_time).value, side='left')
+        mask = np.ones(end - start, dtype=bool)
+        if coin is not None:
+            coin_column = 'Coin' if 'Coin' in self.__arrays else 'Symbol'
+            mask &= self.__arrays[coin_column][start:end] == self.code(coin_column, coin)
+        if side is not None:
+            mask &= self.__arrays['Side'][start:end] == self.code('Side', side)
+        indices = start + np.flatnonzero(mask)
+
+        selected = OrderBook.__new__(OrderBook)
+        selected.columns = self.columns
+        selected.__length = len(indices)
+        selected.__arrays = {column: array[indices] for column, array in self.__arrays.items()}
+        selected.__categories = {column: dict(categories) for column, categories in self.__categories.items()}
+        return selected
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        :return: DataFrame of the orders over the arrays of the book, text columns are categorical
+        """
+        data = {}
+        for column in self.columns:
+            array = self.__arrays[column][:self.__length]
+            if column in self.__categories:
+                data[column] = pd.Categorical.from_codes(array, categories=self.categories(column))
+            elif column == OrderBook.TIME_COLUMN:
+                data[column] = pd.DatetimeIndex(array.view('datetime64[ns]'), copy=False)
+            else:
+                data[column] = array
+        return pd.DataFrame(data, copy=False)
+
+    def to_arrow(self) -> pa.Table:
+        """
+        :return: Arrow table of the orders over the arrays of the book, text columns are dictionary encoded
+        """
+        arrays = []
+        for column in self.columns:
+            array = self.__arrays[column][:self.__length]
+            if column in self.__categories:
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(array),
+                                                             pa.array(self.categories(column), type=pa.string())))
+            elif column == OrderBook.TIME_COLUMN:
+                arrays.append(pa.array(array.view('datetime64[ns]')))
+            else:
+                arrays.append(pa.array(array))
+        return pa.Table.from_arrays(arrays, names=self.columns)
@@ -1,3 +1,5 @@
+import itertools
+
 from abc import ABC
 from binance import Client
 
@@ -6,14 +8,15 @@ class Order(ABC):
     MARKET = 0
     LIMIT = 1
     STOP_LIMIT = 2
-    __id = 0
+    __ids = itertools.count()
+
+    __slots__ = ('id', 'price', 'total_filled', 'symbol')
 
     def __init__(self, symbol):
-        self.id = Order.__id
+        self.id = next(Order.__ids)
         self.price = 0
         self.total_filled = 0
         self.symbol = symbol
-        Order.__id += 1
 
     def filled(self, order, timestamp, curr_price, amount_filled):
         pass
@@ -28,6 +31,8 @@ class SpotOrder(Order):
 
     FEE = 0.1 / 100  # 0.1%
 
+    __slots__ = ('side', 'coin', 'quoted', 'amount', 'order_type', 'timestamp')
+
     def __init__(self, order_type, side, coin, quoted, amount, timestamp):
         super().__init__(symbol=coin+quoted)
         self.side = side
@@ -39,16 +44,34 @@ class SpotOrder(Order):
 
 
 class MarketSpotOrder(SpotOrder):
+    __slots__ = ()
 
     def __init__(self, curr_price, **kwargs):
         super().__init__(order_type=SpotOrder.MARKET, **kwargs)
         self.price = curr_price
 
 
-class StopLimitSpotOrder(SpotOrder):
+class LimitSpotOrder(SpotOrder):
+    __slots__ = ()
 
-    def __init__(self, price, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self, price, **kwargs):
+        """
+        :param price: the order is filled when the market reaches this price, or a better one
+        """
+        super().__init__(order_type=SpotOrder.LIMIT, **kwargs)
+        self.price = price
+
+
+class StopLimitSpotOrder(SpotOrder):
+    __slots__ = ('stop_price',)
+
+    def __init__(self, stop_price, price, **kwargs):
+        """
+        :param stop_price: the order become a limit order when the market reaches this price
+        :param price: the price of the limit order
+        """
+        super().__init__(order_type=SpotOrder.STOP_LIMIT, **kwargs)
+        self.stop_price = stop_price
         self.price = price
 
 
@@ -58,6 +81,8 @@ class FutureOrder(Order):
 
     FEE = 0.1 / 100  # 0.1%
 
+    __slots__ = ('position', 'order_type', 'amount', 'coin', 'leverage')
+
     def __init__(self, order_type, position, coin, amount, leverage):
         super().__init__(symbol=coin + 'USDT')
         self.position = position
@@ -68,6 +93,7 @@ class FutureOrder(Order):
 
 
 class MarketFutureOrder(FutureOrder):
+    __slots__ = ()
 
     def __init__(self, position, coin, leverage, usdt_amount, curr_price):
         super().__init__(Order.MARKET, position, coin, usdt_amount / curr_price, leverage)
@@ -1,7 +1,12 @@
 import numpy as np
 import pandas as pd
 
-from binance_bot_simulation.exchange_bots.future_position import FuturePositions
+from binance_bot_simulation.exchange_bots.event_ledger import EventLedger
+from binance_bot_simulation.exchange_bots.ledger import Ledger
+from binance_bot_simulation.exchange_bots.metrics import PerformanceMetrics
+from binance_bot_simulation.exchange_bots.order_book import OrderBook
+from binance_bot_simulation.exchange_bots.valuation import Valuation
+from binance_bot_simulation.exchange_bots.future_position_book import FuturePositionBook
 from binance_bot_simulation.exchange_bots.orders import SpotOrder, FutureOrder
 
 
@@ -24,36 +29,45 @@ class Portfolio:
     Basic class with the functionality that each portfolio need to have, that any exchange can use
     """
 
-    def __init__(self, timestamp, fee, **coins):
+    # a row of the whole state for each timestamp
+    FULL_HISTORY = 'full'
+    # only the changes of the state are kept, the rows are rebuilt when the history is asked for
+    EVENT_HISTORY = 'events'
+
+    def __init__(self, timestamp, fee, *, history_mode=FULL_HISTORY, quoted='USDT', **coins):
         """
         Portfolio is responsible to save the state of the portfolio in the history
         :param timestamp: when the portfolio initialized
         :param fee: the fee for orders, a number in percents [0 - 100]
+        :param history_mode: how the history is kept, Portfolio.FULL_HISTORY or Portfolio.EVENT_HISTORY
+        :param quoted: the coin that the strategy trades the other coins with, it is not counted as exposure
         :param coins: key-arg of coins and amount, the key is the coin symbols
                         and the arguments are tuple of (amount, price)
         """
         self.start_worth = 0
         self.__fee = fee / 100
         self.last_update = timestamp
-        self.future_positions = {}
+        self.future_positions = FuturePositionBook()
 
         self.available_coins = list(coins.keys())
-        history_columns_names = list(sum([(f'{coin_name} Amount',
-                                           f'{coin_name} A. Price'
-                                           f'{coin_name} Price')
-                                          for coin_name in self.available_coins], ()))
-
-        self.history_dict = {timestamp: {}}
-        self.spot_order_book = []
-        self.future_order_book = []
+        self.spot_order_book = OrderBook.spot()
+        self.future_order_book = OrderBook.future()
+        initial_state = {}
         for coin_symbol, (amount, price) in coins.items():
-            self.history_dict[timestamp][f'{coin_symbol} Amount'] = amount
-            self.history_dict[timestamp][f'{coin_symbol} A. Price'] = price
-            self.history_dict[timestamp][f'{coin_symbol} Price'] = price
+            initial_state[f'{coin_symbol} Amount'] = amount
+            initial_state[f'{coin_symbol} A. Price'] = price
+            initial_state[f'{coin_symbol} Price'] = price
             self.start_worth += amount * price
-        self.history_dict[timestamp]['Future margin balance'] = 0
-        self.history_dict[timestamp]['Future unrealized PNL'] = 0
-        self.__history = pd.DataFrame(columns=history_columns_names)
+        initial_state['Future margin balance'] = 0
+        initial_state['Future unrealized PNL'] = 0
+        if history_mode == Portfolio.FULL_HISTORY:
+            self.ledger = Ledger(timestamp, **initial_state)
+        elif history_mode == Portfolio.EVENT_HISTORY:
+            self.ledger = EventLedger(timestamp, **initial_state)
+        else:
+            raise ValueError(f'Invalid history mode ({history_mode})')
+        self.valuation = Valuation(self.ledger, self.available_coins)
+        self.metrics = PerformanceMetrics(self.start_worth, quoted)
 
     def on_order_filled(self, order, timestamp):
         if isinstance(order, SpotOrder):
@@ -79,7 +93,9 @@ class Portfolio:
             'Percent': None
         }
 
-        last_timestamp = self.history_dict[self.last_update].copy()
+        self.ledger.new_row(timestamp)
+        last_timestamp = self.ledger
+        pnl = None
         if order.side == SpotOrder.BUY:
             amount = order.amount
             quoted = -order.price * amount
@@ -101,6 +117,7 @@ class Portfolio:
             amount = -order.amount
             quoted = -order.price * amount
             avg = last_timestamp[f'{order.coin} A. Price']
+            pnl = (order.price - avg) * order.amount
         else:
             raise ValueError(f'There is invalid value in order book ({order.side})')
 
@@ -111,7 +128,9 @@ class Portfolio:
 
         self.spot_order_book.append(spot_order_as_dict)
 
-        self.history_dict[timestamp] = last_timestamp
+        self.valuation.revalue(order.coin)
+        self.valuation.revalue(order.quoted)
+        self.metrics.on_fill(order.price * order.amount, SpotOrder.FEE, pnl)
         self.last_update = timestamp
 
     def future_order_update(self, order, timestamp):
@@ -126,124 +145,111 @@ class Portfolio:
             'Filled': order.total_filled,
             'Percent': None
         }
-        order_margin = order.price * order.amount
-        last_timestamp = self.history_dict[self.last_update].copy()
-        percent = order_margin / last_timestamp[f'USDT Amount']
+        notional = order.price * order.amount
+        self.ledger.new_row(timestamp)
+        last_timestamp = self.ledger
+        percent = notional / last_timestamp[f'USDT Amount']
         future_order_as_dict['Percent'] = percent
         self.future_order_book.append(future_order_as_dict)
 
+        pnl = None
+        positions = self.future_positions
+        symbol = order.symbol
         # add position to the positions list
-        if order.symbol not in self.future_positions:
-            position = FuturePositions(timestamp=timestamp,
-                                       contract=order.symbol,
-                                       size=order.amount,
-                                       entry_price=order.price,
-                                       position=order.position,
-                                       leverage=order.leverage,)
-            self.future_positions[order.symbol] = position
-            last_timestamp['USDT Amount'] -= order_margin
-            last_timestamp['Future margin balance'] += order_margin
+        # the wallet posts only the margin of the position, the value of the order divided by its leverage,
+        # the same margin that the position book returns when the position is closed or lost when it is liquidated
+        if symbol not in positions:
+            margin = positions.open(symbol, order.coin, order.amount, order.price, order.position, order.leverage)
+            last_timestamp['USDT Amount'] -= margin
+            last_timestamp['Future margin balance'] += margin
         else:
-            position = self.future_positions[order.symbol]
-            if position.leverage != order.leverage:
+            if positions.position_leverage(symbol) != order.leverage:
                 raise ValueError('leverage cant be different between same positions')
             # if make the position bigger
-            if order.position == position.position:
-                position.entry_price = ((position.entry_price * position.size) + (order.price * order.amount)) / (position.size + order.amount)
-                position.size += order.amount
-                last_timestamp['USDT Amount'] -= order_margin
-                last_timestamp['Future margin balance'] += order_margin
+            if order.position == positions.position_side(symbol):
+                margin = positions.increase(symbol, order.amount, order.price)
+                last_timestamp['USDT Amount'] -= margin
+                last_timestamp['Future margin balance'] += margin
             else:
-                # if the order is smaller than the actual position
-                if order.amount <= position.size:
-                    pnl, margin = position.close_position(order.amount, last_timestamp[f'{order.coin} Price'])
-                    # add the pnl and the margin to the wallet
-                    last_timestamp['USDT Amount'] += pnl + margin
-
-                    # remove this numbers from the future position
-                    last_timestamp['Future unrealized PNL'] -= pnl
-                    last_timestamp['Future margin balance'] -= margin
-                else:
-                    pnl, margin = position.close_position(position.size, last_timestamp[f'{order.coin} Price'])
-                    # add the pnl and the margin to the wallet
-                    last_timestamp['USDT Amount'] += pnl + margin
-
-                    # remove this numbers from the future position
-                    last_timestamp['Future unrealized PNL'] -= pnl
-                    last_timestamp['Future margin balance'] -= margin
-
-                    # now create new position instead
-                    position = FuturePositions(timestamp=timestamp,
-                                               contract=order.symbol,
-                                               size=order.amount - position.size,
-                                               entry_price=order.price,
-                                               position=order.position,
-                                               leverage=order.leverage)
-                    self.future_positions[order.symbol] = position
-                    last_timestamp['USDT Amount'] -= order_margin
-                    last_timestamp['Future margin balance'] += order_margin
-
-        self.history_dict[timestamp] = last_timestamp
+                position_size = positions.position_size(symbol)
+                pnl, margin = positions.close(symbol, order.amount, last_timestamp[f'{order.coin} Price'])
+                # add the pnl and the margin to the wallet
+                last_timestamp['USDT Amount'] += pnl + margin
+
+                # remove this numbers from the future position
+                last_timestamp['Future unrealized PNL'] -= pnl
+                last_timestamp['Future margin balance'] -= margin
+
+                # if the order is bigger than the actual position create new position instead
+                if order.amount > position_size:
+                    margin = positions.open(symbol, order.coin, order.amount - position_size, order.price,
+                                            order.position, order.leverage)
+                    last_timestamp['USDT Amount'] -= margin
+                    last_timestamp['Future margin balance'] += margin
+
+        self.valuation.revalue('USDT')
+        self.metrics.on_fill(notional, FutureOrder.FEE, pnl)
         self.last_update = timestamp
 
     def close_future_position(self, timestamp, coin, size, curr_price):
-        try:
-            position = self.future_positions[coin]
-        except KeyError:
+        """
+        :param coin: the symbol of the contract
+        :param size: the size of the position to close
+        :param curr_price: the price that the position is closed in
+        """
+        if coin not in self.future_positions:
             return
 
-        new_update = self.history_dict[timestamp].copy()
-        pnl, margin = position.close_future_position(size, curr_price)
-        print(f'{timestamp}\npnl: {pnl}')
+        self.ledger.new_row(timestamp)
+        new_update = self.ledger
+        pnl, margin = self.future_positions.close(coin, size, curr_price)
         new_update['USDT Amount'] += pnl + margin
 
         # remove this numbers from the future position
         new_update['Future unrealized PNL'] -= pnl
         new_update['Future margin balance'] -= margin
-        self.history_dict[timestamp] = new_update
+        self.valuation.revalue('USDT')
+        self.metrics.on_fill(size * curr_price, FutureOrder.FEE, pnl)
         self.last_update = timestamp
 
     def check_future_position_liquid(self, candle):
-        to_remove = []
-        for position in self.future_positions:
-            if position.is_got_liquid(candle):
-                to_remove.append(position.symbol)
-
-        for symbol in to_remove:
-            del self.future_positions[symbol]
+        """
+        Mark the positions of the candle coin and remove the positions that got liquid, their margin is lost
+        :return: the symbols of the liquidated positions
+        """
+        positions = self.future_positions
+        positions.update_marks(candle)
+        symbols, margins = positions.liquidate()
+        if symbols:
+            self.ledger['Future margin balance'] -= sum(margins)
+        return symbols
 
     def update_history(self, timestamp, candle):
-        if timestamp not in self.history_dict:
-            last_timestamp = self.history_dict[self.last_update].copy()
-            if len(self.history_dict) == 1000:
-                self.__history = pd.concat([self.__history,
-                                            pd.DataFrame.from_dict(self.history_dict, orient='index')])
-                self.history_dict = {}  # to save only the current value
-
-            self.history_dict[timestamp] = last_timestamp
-        self.history_dict[timestamp][f'{candle["Coin"]} Price'] = candle["Close"]
-        self.history_dict[timestamp]['Future unrealized PNL'] = self.calculate_unrealized_pnl(candle["Close"])
+        coin = candle['Coin']
+        ledger = self.ledger
+        valuation = self.valuation
+        ledger.new_row(timestamp)
+        ledger.current[valuation.price_columns[coin]] = candle['Close']
+        self.check_future_position_liquid(candle)
+        ledger.current[valuation.upnl_column] = self.calculate_unrealized_pnl()
+        valuation.revalue(coin)
+        self.metrics.on_tick(timestamp, valuation.worth(), valuation.dollar_values.get(self.metrics.quoted, 0))
         self.last_update = timestamp
 
-    def calculate_unrealized_pnl(self, curr_price):
-        upnl = 0
-        for id, position in self.future_positions.items():
-            upnl = position.pnl(curr_price)
-        return upnl
+    def calculate_unrealized_pnl(self):
+        """
+        :return: the unrealized pnl of all of the future positions, each in the mark price of its coin
+        """
+        return self.future_positions.unrealized_pnl()
 
     def history(self, period=0):
+        """
+        :param period: if it is positive return only the state of `period` updates ago
+        :return: DataFrame of the portfolio state in each update
+        """
         if period > 0:
-            if len(self.history_dict) < period:
-                self.__history = pd.concat([self.__history,
-                                            pd.DataFrame.from_dict(self.history_dict, orient='index')])
-                self.history_dict = {}
-            return self.__history.iloc[-period]
-
-        if len(self.history_dict) > 0:
-            self.__history = pd.concat([self.__history,
-                                        pd.DataFrame.from_dict(self.history_dict, orient='index')])
-            self.history_dict = {}
-        return self.__history
+            return self.ledger.to_frame(period).iloc[-period]
+        return self.ledger.to_frame()
 
     def amount_of(self, coin, percent=100, as_coin=None):
         """
@@ -258,24 +264,14 @@ class Portfolio:
         if as_coin is None:
             as_coin = 1
         else:
-            as_coin = self.history_dict[self.last_update][f'{as_coin} Price']
-        try:
-            return self.history_dict[self.last_update][f'{coin} Amount'] * percent / as_coin
-        except KeyError:
-            return self.__history.loc[self.last_update][f'{coin} Amount'] * percent / as_coin
+            as_coin = self.valuation.price(as_coin)
+        return self.valuation.amount(coin) * percent / as_coin
 
     def dollar_status(self):
         """
         :return: dictionary with each coin symbol and its dollar value ( in portfolio, nor its price)
         """
-        res = {}
-        for coin in self.available_coins:
-            try:
-                coin_price = self.history_dict[self.last_update][f'{coin} Price']
-            except KeyError:
-                coin_price = self.__history.loc[self.last_update][f'{coin} Price']
-            res[coin] = self.amount_of(coin) * coin_price
-        return res
+        return dict(self.valuation.dollar_values)
 
     def coins_status(self):
         """
@@ -291,28 +287,15 @@ class Portfolio:
         :param coin: the coin symbol to check
         :return: an average price of coin
         """
-        try:
-            return self.history_dict[self.last_update][f'{coin} A. Price']
-        except KeyError:
-            return self.__history[self.last_update][f'{coin} A. Price']
+        return self.valuation.avg_price(coin)
 
     def portfolio_worth(self, coin=None):
         """
         :return: how much this portfolio worth
         """
-
-        if self.last_update in self.history_dict:
-            last_update = self.history_dict[self.last_update]
-        else:
-            last_update = self.__history.loc[self.last_update]
         if coin is None:
-            coin_price = 1
-        else:
-            coin_price = last_update[f'{coin} Price']
-        future = last_update[f'Future margin balance']
-        future += last_update[f'Future unrealized PNL']
-        res = sum(self.dollar_status().values()) + future
-        return res / coin_price
+            return self.valuation.worth()
+        return self.valuation.worth() / self.valuation.price(coin)
 
     def history_worth(self, coin, name=''):
         history = self.history()
@@ -335,16 +318,17 @@ class Portfolio:
 
     def __str__(self):
         res = ''
-        dollar_status = self.dollar_status()
+        dollar_status = self.valuation.dollar_values
+        worth = self.portfolio_worth()
         for coin in self.available_coins:
             amount = Portfolio.__print_blue(f'{self.amount_of(coin):.2f}')
             price = Portfolio.__print_green(f'{self.avg_price_of(coin):.2f}')
-            part_of_wallet = dollar_status[coin] / self.portfolio_worth() * 100
+            part_of_wallet = dollar_status[coin] / worth * 100
             part_of_wallet = Portfolio.__percent_color(f'{part_of_wallet:.1f}')
             res += f'| {amount} {coin} [{price}] {part_of_wallet} '
 
-        margin = Portfolio.__print_blue(f'{self.history_dict[self.last_update]["Future margin balance"]:.1f}')
-        upnl = Portfolio.__print_blue(f'{self.history_dict[self.last_update]["Future unrealized PNL"]:.1f}')
+        margin = Portfolio.__print_blue(f'{self.ledger["Future margin balance"]:.1f}')
+        upnl = Portfolio.__print_blue(f'{self.ledger["Future unrealized PNL"]:.1f}')
         res += f'| Future margin [{margin}] '
         res += f'| Future uPNL [{upnl}] '
         return res
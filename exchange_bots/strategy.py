@@ -23,6 +23,15 @@ class Strategy(ABC):
         self.coins = coins
         self.quoted = quoted
 
+    @classmethod
+    def get_lookbacks(cls):
+        """
+        :return: dictionary of interval to the number of the last candles of it that the strategy reads,
+                 the exchange keeps only these candles of each coin in the interval, intervals that are not in it
+                 keep the exchange memory_length candles
+        """
+        return {}
+
     def set_exchange(self, exchange):
         self.exchange = exchange
 
@@ -0,0 +1,47 @@
+class Valuation:
+    """
+    Running worth of a portfolio.
+    It keeps the dollar value of each coin and their sum, and when the amount or the price of a coin changes only this
+    coin is valued again, so the worth of the portfolio is always ready without going over all of its coins.
+    """
+
+    def __init__(self, ledger, coins):
+        """
+        :param ledger: the ledger of the portfolio state
+        :param coins: the symbols of the coins of the portfolio
+        """
+        self.ledger = ledger
+        self.amount_columns = {coin: ledger.column_index[f'{coin} Amount'] for coin in coins}
+        self.price_columns = {coin: ledger.column_index[f'{coin} Price'] for coin in coins}
+        self.avg_price_columns = {coin: ledger.column_index[f'{coin} A. Price'] for coin in coins}
+        self.margin_column = ledger.column_index['Future margin balance']
+        self.upnl_column = ledger.column_index['Future unrealized PNL']
+        self.dollar_values = {coin: self.amount(coin) * self.price(coin) for coin in coins}
+        self.spot_worth = sum(self.dollar_values.values())
+
+    def amount(self, coin):
+        return self.ledger.current[self.amount_columns[coin]]
+
+    def price(self, coin):
+        return self.ledger.current[self.price_columns[coin]]
+
+    def avg_price(self, coin):
+        return self.ledger.current[self.avg_price_columns[coin]]
+
+    def revalue(self, coin):
+        """
+        Update the value of coin after its amount or price has changed
+        """
+        value = self.amount(coin) * self.price(coin)
+        self.spot_worth += value - self.dollar_values[coin]
+        self.dollar_values[coin] = value
+
+    def future_worth(self):
+        current = self.ledger.current
+        return current[self.margin_column] + current[self.upnl_column]
+
+    def worth(self):
+        """
+        :return: the dollar worth of the spot coins and the future positions
+        """
+        return self.spot_worth + self.future_worth()
@@ -1,76 +1,98 @@
-from collections import Sequence
+from collections.abc import Sequence
 
 import numpy as np
 
 
-# all operations are O(1) and don't require copying the array
-# except to_array which has to copy the array and is O(n)
+# all operations are O(1) and don't copy the array, the values are read as views of it
 class CircularQueue:
+    """
+    Queue of the last `maxlen` values that were added to it.
+    Each value is written twice, in its place in the ring and in the same place in a mirror of the ring right after it,
+    so the values of the queue, in the order they were added, are always contiguous in the buffer and any window of
+    them is a read-only view without a copy.
+    The values can be rows of a 2-D array, the buffer is column-major so each column of a window is contiguous too.
+    """
 
     def __init__(self, obj: Sequence, maxlen: int):
+        """
+        :param obj: the first values of the queue, only the last `maxlen` of them are kept, a 2-D array for a queue
+                    of rows
+        :param maxlen: the max number of values in the queue
+        """
+        if maxlen < 1:
+            raise ValueError(f'The max length of a CircularQueue must be at least 1 ({maxlen})')
         # allocate the memory we need ahead of time
         self.max_length: int = maxlen
-        self.queue_tail: int = maxlen - 1
-        self.queue_head: int = 0
-        o_len = len(obj)
-        if o_len == maxlen:
-            self.rec_queue = np.array(obj)
-        elif o_len > maxlen:
-            self.rec_queue = np.array(obj[o_len - maxlen:])
-        else:
-            self.rec_queue = np.append(np.array(obj), np.zeros(maxlen - o_len))
-            self.queue_tail = o_len - 1
+        values = np.asarray(obj)
+        values = values[max(len(values) - maxlen, 0):]
+        self.__buffer = np.zeros((2 * maxlen,) + values.shape[1:],
+                                 dtype=values.dtype if values.dtype != object else np.float64,
+                                 order='F')
+        self.__view = self.__buffer.view()
+        self.__view.flags.writeable = False
+        self.__length = len(values)
+        # the buffer index after the last value, in the mirror half of the buffer
+        self.__end = maxlen + self.__length
+        self.__buffer[:self.__length] = values
+        self.__buffer[maxlen:self.__end] = values
 
-    def to_array(self) -> np.array:
-        if self.queue_tail < self.queue_head:
-            return self.rec_queue[self.queue_head:] + self[:self.queue_head]
-        return self.rec_queue[:self.queue_tail]
-        # return np.roll(self.rec_queue, -self.queue_head)  # this will force a copy
+    def __len__(self):
+        return self.__length
 
-    def enqueue(self, new_data) -> None:
-        # move tail pointer forward then insert at the tail of the queue
-        # to enforce max length of recording
-        self.queue_tail = (self.queue_tail + 1) % self.max_length
-        self.rec_queue[self.queue_tail] = new_data
-        if self.queue_tail == self.queue_head:
-            self.queue_head = (self.queue_tail + 1) % self.max_length
+    def to_array(self) -> np.ndarray:
+        """
+        :return: read-only view of the values from the first added to the last added
+        """
+        return self.__view[self.__end - self.__length:self.__end]
 
-    def peek(self) -> int:
-        return self.rec_queue[self.queue_head]
+    def last(self, n: int) -> np.ndarray:
+        """
+        :return: read-only view of the last n values, or all of the values if the queue has less than n
+        """
+        return self.__view[self.__end - min(n, self.__length):self.__end]
 
-    def __setitem__(self, index: int, new_value: int):
-        loc = (self.queue_tail + 1 + index) % self.max_length
-        self.rec_queue[loc] = new_value
+    def enqueue(self, new_data) -> None:
+        if self.__end == 2 * self.max_length:
+            self.__end = self.max_length
+        index = self.__end - self.max_length
+        self.__buffer[index] = new_data
+        self.__buffer[self.__end] = new_data
+        self.__end += 1
+        if self.__length < self.max_length:
+            self.__length += 1
 
-    def __getitem__(self, key) -> int:
-        if isinstance(key, slice):
+    def peek(self):
+        """
+        :return: the first value of the queue
+        """
+        return self.__buffer[self.__end - self.__length]
 
-            if key.start is not None and key.start != 0:
-                raise ValueError("Not implemented yet :/ slice start must be 0")
-            if key.step is not None and key.step != 1:
-                raise ValueError("Not implemented yet :/ slice step must be 1")
-            if key.stop is None:
-                key.stop = self.max_length - 1
-            start = self.queue_head
-            stop = self.queue_head + key.stop
-            if stop < start:
-                start = (self.queue_head + self.max_length + key.stop) % self.max_length
-                stop = (start - key.stop) % self.max_length
-                if stop == 0:
-                    stop = self.max_length
+    def __position(self, index: int) -> int:
+        """
+        :return: the ring position of the value in index of the queue
+        """
+        if index < 0:
+            index += self.__length
+        if not 0 <= index < self.__length:
+            raise IndexError('CircularQueue index out of range')
+        return (self.__end - self.__length + index) % self.max_length
 
-            if start < stop:
-                return self.rec_queue[start:stop]
-            else:
-                return np.concatenate((self.rec_queue[start:],
-                                       self.rec_queue[:stop]), axis=None)
+    def __setitem__(self, index: int, new_value):
+        position = self.__position(index)
+        self.__buffer[position] = new_value
+        self.__buffer[position + self.max_length] = new_value
 
-        # the item we want will be at head + index
-        loc = (self.queue_head + key) % self.max_length
-        return self.rec_queue[loc]
+    def __getitem__(self, key):
+        """
+        :param key: index or slice of the values, from the first added to the last added
+        :return: the value, or read-only view of the values of the slice
+        """
+        if isinstance(key, slice):
+            return self.to_array()[key]
+        return self.__buffer[self.__position(key) + self.max_length]
 
     def __repr__(self):
         return str(self)
 
     def __str__(self):
-        return f"tail: {self.queue_tail}\narray: {self.rec_queue}"
+        return f"length: {self.__length}\narray: {self.to_array()}"
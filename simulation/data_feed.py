@@ -0,0 +1,103 @@
+import heapq
+
+import pandas as pd
+
+
+class Candle:
+    """
+    Read only view over a single row of a columnar feed.
+    The simulation moves the same view from row to row instead of building a new dictionary per candle,
+    so a strategy that wants to keep a candle after its callback returns should keep `candle.to_dict()`.
+    """
+    __slots__ = ('_columns', '_index')
+
+    def __init__(self, columns, index=0):
+        self._columns = columns
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._columns[key][self._index]
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self._columns.keys()
+
+    def to_dict(self):
+        return {key: column[self._index] for key, column in self._columns.items()}
+
+    def __repr__(self):
+        return str(self.to_dict())
+
+
+class ColumnarFeed:
+    """
+    Data feed that keeps each candle field in its own numpy array.
+    The columns are extracted once when the feed is created, iterating the feed yields the same `Candle` view
+    moved to the next row, so the simulation loop doesn't allocate anything per candle.
+    """
+
+    COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'isClose', 'interval', 'Coin']
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        :param df: candles DataFrame indexed by 'Close time', with at least the columns in `ColumnarFeed.COLUMNS`
+        """
+        self.columns = {key: df[key].to_numpy() for key in ColumnarFeed.COLUMNS}
+        # keep the timestamps as pd.Timestamp objects, the portfolio use them as its history index
+        self.columns['Close time'] = df.index.astype(object).to_numpy()
+        self.times = df.index.asi8
+        self.length = len(df)
+        if self.length > 0:
+            self.coin = df['Coin'].iloc[0]
+            self.minutes_interval = df['minutes_interval'].iloc[0]
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        candle = Candle(self.columns)
+        for i in range(self.length):
+            candle._index = i
+            yield candle
+
+
+def merge_feeds(feeds):
+    """
+    Merge time sorted feeds into a single stream of candles.
+    The candles are ordered by close time, then by the interval length and then by coin, which is the same
+    order as concatenating the feeds and sorting them, but the merge is lazy and only keeps one heap entry per feed.
+    :param feeds: list of `ColumnarFeed`, each one must be sorted by its close time
+    :return: generator of `Candle` views, each feed has its own view that moves forward when it yields
+    """
+    feeds = [feed for feed in feeds if len(feed) > 0]
+    candles = [Candle(feed.columns) for feed in feeds]
+    heap = [[feed.times[0], feed.minutes_interval, feed.coin, i] for i, feed in enumerate(feeds)]
+    heapq.heapify(heap)
+    while heap:
+        entry = heap[0]
+        i = entry[3]
+        candle = candles[i]
+        yield candle
+
+        row = candle._index + 1
+        feed = feeds[i]
+        if row < feed.length:
+            candle._index = row
+            entry[0] = feed.times[row]
+            heapq.heapreplace(heap, entry)
+        else:
+            heapq.heappop(heap)
@@ -0,0 +1,72 @@
+import os
+from collections import OrderedDict
+
+import pandas as pd
+
+from binance_bot_simulation.binance.kline_store import KlineStore, interval_minutes, to_ms
+
+
+class IntrabarCandles:
+    """
+    Candles of a lower interval inside the bars of the simulation, for the bars that the order of the fills in them
+    can't be known from their range alone.
+    Only the candles inside a bar are read from the kline store, when the bar is asked for, and the last bars are kept
+    in memory, so an object can be shared by simulations over the same data.
+    Bars that the store doesn't have are not kept, and the coverage of the store is read again when its file changes,
+    so candles that are downloaded later are found.
+    """
+
+    MAX_BARS = 4096
+
+    def __init__(self, kline_store: KlineStore = None, interval='1m', max_bars=MAX_BARS):
+        """
+        :param kline_store: the store to read the candles from, the default is the store in 'cache/klines'
+        :param interval: the interval of the candles inside the bars
+        :param max_bars: number of bars to keep in memory
+        """
+        self.kline_store = kline_store if kline_store is not None else KlineStore()
+        self.interval = interval
+        self.minutes_interval = interval_minutes(interval)
+        self.max_bars = max_bars
+        self.__bars = OrderedDict()
+        self.__coverage = {}
+
+    def __covers(self, symbol, start, end):
+        try:
+            stat = os.stat(self.kline_store.path(symbol, self.interval))
+            version = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return False
+        if symbol not in self.__coverage or self.__coverage[symbol][0] != version:
+            self.__coverage[symbol] = (version, self.kline_store.coverage(symbol, self.interval))
+        return any(range_start <= start and end <= range_end for range_start, range_end in self.__coverage[symbol][1])
+
+    def candles(self, symbol, close_time: pd.Timestamp, minutes_interval):
+        """
+        :param symbol: the symbol of the bar
+        :param close_time: the close time of the bar
+        :param minutes_interval: the interval of the bar in minutes
+        :return: tuple of the arrays (open, high, low) of the candles inside the bar in time order,
+                 None if the bar is not longer than the candles or the store doesn't have all of them
+        """
+        if minutes_interval <= self.minutes_interval:
+            return None
+        open_time = close_time - pd.Timedelta(minutes=minutes_interval)
+        key = (symbol, close_time, minutes_interval)
+        if key in self.__bars:
+            self.__bars.move_to_end(key)
+            return self.__bars[key]
+
+        if not self.__covers(symbol, to_ms(open_time), to_ms(close_time)):
+            return None
+        df = self.kline_store.read(symbol, self.interval,
+                                   columns=['Open', 'High', 'Low'],
+                                   start_time=open_time,
+                                   end_time=close_time)
+        if len(df) == 0:
+            return None
+        bar = (df['Open'].to_numpy(), df['High'].to_numpy(), df['Low'].to_numpy())
+        self.__bars[key] = bar
+        if len(self.__bars) > self.max_bars:
+            self.__bars.popitem(last=False)
+        return bar
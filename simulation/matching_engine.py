@@ -0,0 +1,156 @@
+import bisect
+import itertools
+import math
+
+from binance_bot_simulation.exchange_bots.orders import Order, SpotOrder, FutureOrder
+
+
+class SortedOrders:
+    """
+    Orders sorted by a price, orders with the same price are kept in the order they were added
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.orders = []
+
+    def __len__(self):
+        return len(self.orders)
+
+    def add(self, price, sequence, order):
+        index = bisect.bisect_right(self.keys, (price, sequence))
+        self.keys.insert(index, (price, sequence))
+        self.orders.insert(index, order)
+
+    def any_between(self, low, high):
+        """
+        :return: true if there is an order with price in [low, high]
+        """
+        return bisect.bisect_left(self.keys, (low,)) < bisect.bisect_right(self.keys, (high, float('inf')))
+
+    def pop_from(self, price):
+        """
+        :return: the orders with price that is equal or higher than price, they are removed
+        """
+        index = bisect.bisect_left(self.keys, (price,))
+        orders = self.orders[index:]
+        del self.keys[index:]
+        del self.orders[index:]
+        return orders
+
+    def pop_until(self, price):
+        """
+        :return: the orders with price that is equal or lower than price, they are removed
+        """
+        index = bisect.bisect_right(self.keys, (price, float('inf')))
+        orders = self.orders[:index]
+        del self.keys[:index]
+        del self.orders[:index]
+        return orders
+
+
+class CoinOrders:
+    """
+    The resting orders of a coin, the limit and the stop orders of each side are sorted by their trigger price
+    """
+
+    def __init__(self):
+        self.buy_limits = SortedOrders()
+        self.sell_limits = SortedOrders()
+        self.buy_stops = SortedOrders()
+        self.sell_stops = SortedOrders()
+
+    def __len__(self):
+        return len(self.buy_limits) + len(self.sell_limits) + len(self.buy_stops) + len(self.sell_stops)
+
+    def orders(self):
+        return self.buy_limits.orders + self.sell_limits.orders + self.buy_stops.orders + self.sell_stops.orders
+
+
+class MatchingEngine:
+    """
+    Matching of resting limit and stop orders against candles.
+    The orders of each coin and side are sorted by price, so a candle takes only the orders that its High/Low range
+    reached, with binary search, and the orders that it didn't reach are not touched at all.
+    """
+
+    def __init__(self):
+        self.__coins = {}
+        self.__sequence = itertools.count()
+
+    def __len__(self):
+        return sum(len(coin_orders) for coin_orders in self.__coins.values())
+
+    def orders(self):
+        """
+        :return: all of the resting orders
+        """
+        return [order for coin_orders in self.__coins.values() for order in coin_orders.orders()]
+
+    def clear(self):
+        self.__coins.clear()
+
+    @staticmethod
+    def is_buy(order):
+        if isinstance(order, FutureOrder):
+            return order.position == FutureOrder.LONG
+        return order.side == SpotOrder.BUY
+
+    def add(self, order):
+        """
+        :param order: limit or stop limit order
+        """
+        coin_orders = self.__coins.get(order.coin)
+        if coin_orders is None:
+            coin_orders = self.__coins[order.coin] = CoinOrders()
+        is_buy = MatchingEngine.is_buy(order)
+        if order.order_type == Order.LIMIT:
+            book, price = (coin_orders.buy_limits if is_buy else coin_orders.sell_limits), order.price
+        elif order.order_type == Order.STOP_LIMIT:
+            book, price = (coin_orders.buy_stops if is_buy else coin_orders.sell_stops), order.stop_price
+        else:
+            raise ValueError(f'Only limit and stop limit orders can rest in the matching engine ({order.order_type})')
+        book.add(price, next(self.__sequence), order)
+
+    def is_ambiguous(self, coin, open_price, high, low):
+        """
+        :return: true if the candle reached orders of coin both above and below its open price, the order that the
+                 prices were reached in can't be known from the candle alone
+        """
+        coin_orders = self.__coins.get(coin)
+        if coin_orders is None or len(coin_orders) == 0:
+            return False
+        above = math.nextafter(open_price, math.inf)
+        below = math.nextafter(open_price, -math.inf)
+        return ((coin_orders.sell_limits.any_between(above, high) or coin_orders.buy_stops.any_between(above, high)) and
+                (coin_orders.buy_limits.any_between(low, below) or coin_orders.sell_stops.any_between(low, below)))
+
+    def match(self, coin, open_price, high, low):
+        """
+        Take the orders of coin that the candle range reached.
+        A limit order is filled in its price, or in the open price if the candle opened beyond it.
+        A stop limit order is triggered in its stop price, or in the open price if the candle opened beyond it, and it is
+        filled there if its limit price allows it, otherwise it rests as a limit order from the next candle.
+        :return: list of tuples of (order, fill price), sorted by the distance of the fill price from the open price
+                 which is the order that the prices were probably reached in
+        """
+        coin_orders = self.__coins.get(coin)
+        if coin_orders is None or len(coin_orders) == 0:
+            return []
+        fills = [(order, min(order.price, open_price)) for order in coin_orders.buy_limits.pop_from(low)]
+        fills += [(order, max(order.price, open_price)) for order in coin_orders.sell_limits.pop_until(high)]
+        # the limit orders of triggered stops rest from the next candle, the price reached them after this candle open
+        for order in coin_orders.buy_stops.pop_until(high):
+            trigger_price = max(order.stop_price, open_price)
+            if order.price >= trigger_price:
+                fills.append((order, trigger_price))
+            else:
+                coin_orders.buy_limits.add(order.price, next(self.__sequence), order)
+        for order in coin_orders.sell_stops.pop_from(low):
+            trigger_price = min(order.stop_price, open_price)
+            if order.price <= trigger_price:
+                fills.append((order, trigger_price))
+            else:
+                coin_orders.sell_limits.add(order.price, next(self.__sequence), order)
+        fills.sort(key=lambda fill: abs(fill[1] - open_price))
+        return fills
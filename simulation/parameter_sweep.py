@@ -0,0 +1,142 @@
+import hashlib
+import inspect
+import itertools
+import multiprocessing
+
+import pandas as pd
+
+from typing import Iterable
+
+from common import timing
+from binance_bot_simulation.exchange_bots.metrics import PerformanceMetrics
+from binance_bot_simulation.simulation.simulation import load_simulation_data, run_simulation, \
+    default_initial_portfolio
+from binance_bot_simulation.simulation.result_cache import SimulationCache
+
+# the data of the sweep, set once in each worker process by _init_worker
+_sweep_data = None
+
+
+def parameter_grid(**params_values):
+    """
+    :param params_values: key-arg of strategy parameter name and an iterable of its values
+    :return: list of all the combinations of the parameters, each one is a dictionary of key-args
+    """
+    names = list(params_values.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*params_values.values())]
+
+
+def simulation_summary(portfolio):
+    """
+    :return: dictionary with the summary of a simulation portfolio
+    """
+    return {
+        'Worth': portfolio.portfolio_worth(),
+        **portfolio.metrics.summary(),
+        'Spot orders': len(portfolio.spot_order_book),
+        'Future orders': len(portfolio.future_order_book),
+    }
+
+
+def summary_version():
+    """
+    :return: hash of the code that makes the summary, the cached summaries of an older code are not used
+    """
+    source = hashlib.sha256()
+    for code in (simulation_summary, PerformanceMetrics):
+        source.update(inspect.getsource(code).encode())
+    return source.hexdigest()
+
+
+def _init_worker(sweep_data):
+    global _sweep_data
+    _sweep_data = sweep_data
+
+
+def _run_params(strategy_params):
+    train_dfs, test_dfs, simulation_args, simulation_cache, data_fingerprint, summary_code = _sweep_data
+    cache_key = None
+    if simulation_cache is not None:
+        cache_key = simulation_cache.key(data_fingerprint,
+                                         simulation_args['strategy_class'],
+                                         result='summary',
+                                         summary_version=summary_code,
+                                         initial_portfolio=simulation_args['initial_portfolio'].init_portfolio,
+                                         strategy_params=strategy_params)
+        summary = simulation_cache.get(cache_key)
+        if summary is not None:
+            return {**strategy_params, **summary}
+
+    simulation = run_simulation(train_dfs, test_dfs, verbose=False, **simulation_args, **strategy_params)
+    summary = simulation_summary(simulation.portfolio)
+    if simulation_cache is not None:
+        simulation_cache.put(cache_key, summary)
+    return {**strategy_params, **summary}
+
+
+@timing
+def parameter_sweep(coins: Iterable,
+                    quoted: str,
+                    train_size: float,
+                    strategy_class,
+                    start_time: pd.Timestamp,
+                    end_time: pd.Timestamp = None,
+                    initial_portfolio=None,
+                    processes: int = None,
+                    verbose=True,
+                    save_pickle=True,
+                    simulation_cache: SimulationCache = None,
+                    **params_grid) -> pd.DataFrame:
+    """
+    Run `full_simulation` for each combination of the strategy parameters in a pool of processes.
+    The klines are loaded once, before the pool starts, and the workers get them when they are created,
+    on platforms that fork the data is shared with the workers without copying it at all.
+    :param processes: number of worker processes, the default is the number of cpus
+    :param save_pickle: use the cache of the simulations results, only simulations that are not cached are run
+    :param simulation_cache: the cache of the results, the default is the cache in 'cache/simulation'
+    :param params_grid: key-arg of strategy parameter name and an iterable of its values
+    :return: DataFrame with row for each combination, the parameters and the summary of its simulation
+    """
+    if end_time is None:
+        end_time = pd.Timestamp.now('UTC').tz_localize(None)
+    if initial_portfolio is None:
+        initial_portfolio = default_initial_portfolio(coins, quoted)
+    coins = list(coins)
+    combinations = parameter_grid(**params_grid)
+
+    train_dfs, test_dfs = load_simulation_data(coins, quoted, train_size, strategy_class, start_time, end_time,
+                                               verbose=verbose)
+    simulation_args = {
+        'strategy_class': strategy_class,
+        'coins': coins,
+        'quoted': quoted,
+        'initial_portfolio': initial_portfolio,
+    }
+    data_fingerprint = None
+    summary_code = None
+    if not save_pickle:
+        simulation_cache = None
+    else:
+        if simulation_cache is None:
+            simulation_cache = SimulationCache()
+        data_fingerprint = SimulationCache.data_fingerprint(train_dfs, test_dfs)
+        summary_code = summary_version()
+    sweep_data = (train_dfs, test_dfs, simulation_args, simulation_cache, data_fingerprint, summary_code)
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    if processes is None:
+        processes = context.cpu_count()
+    # few big chunks per worker keep the workers busy without paying inter process overhead per simulation
+    chunksize = max(1, len(combinations) // (processes * 4))
+    with context.Pool(processes, initializer=_init_worker, initargs=(sweep_data,)) as pool:
+        results = []
+        for i, result in enumerate(pool.imap(_run_params, combinations, chunksize=chunksize)):
+            results.append(result)
+            if verbose:
+                print(f'\r{i + 1}/{len(combinations)} simulations', end='')
+    if verbose:
+        print()
+    return pd.DataFrame(results)
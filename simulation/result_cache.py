@@ -0,0 +1,172 @@
+import os
+import json
+import pickle
+import hashlib
+import inspect
+import tempfile
+
+import pandas as pd
+
+from binance_bot_simulation.binance.kline_store import KlineStore, ceil_to_interval, floor_to_interval, to_ms
+
+
+class SimulationCache:
+    """
+    Cache of simulations results on disk.
+    Each result is saved in its own file, named by a hash of everything that can change the result - the data,
+    the strategy code and all of the parameters by their names, so a lookup is a single file open.
+    The total size of the cache is bounded, when it is exceeded the least recently used results are removed.
+    The size is scanned from the folder after each put, so the bound holds also for processes that write to the same
+    cache together, like the workers of a parameter sweep.
+    """
+
+    EVICTION_RATIO = 0.9
+
+    def __init__(self, root='cache/simulation', max_size=2 * 1024 ** 3):
+        """
+        :param root: the folder of the cache
+        :param max_size: maximum size in bytes of all the cached results
+        """
+        self.root = root
+        self.max_size = max_size
+
+    @staticmethod
+    def data_fingerprint(*dfs_dicts):
+        """
+        :param dfs_dicts: dictionaries of { coin: { interval: df } } of the simulation data
+        :return: hash of the content of the data frames
+        """
+        fingerprint = hashlib.sha256()
+        for dfs_dict in dfs_dicts:
+            for coin in sorted(dfs_dict):
+                for interval in sorted(dfs_dict[coin]):
+                    df = dfs_dict[coin][interval]
+                    fingerprint.update(f'{coin}/{interval}/{len(df)}'.encode())
+                    fingerprint.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+        return fingerprint.hexdigest()
+
+    @staticmethod
+    def store_fingerprint(kline_store: KlineStore, symbols, intervals, start_time: pd.Timestamp, end_time: pd.Timestamp):
+        """
+        Fingerprint of the klines that a read of the store will return, without reading them. The candles of a range
+        that the store covers are decided by the store files and the range aligned to the candles, so the files are
+        fingerprinted by their size and modification time.
+        :return: hash of the files and the aligned ranges, None if the store doesn't cover all of the range
+                 and the klines have to be downloaded
+        """
+        fingerprint = hashlib.sha256()
+        for symbol in sorted(symbols):
+            for interval in sorted(intervals):
+                if not kline_store.covers(symbol, interval, start_time, end_time):
+                    return None
+                stat = os.stat(kline_store.path(symbol, interval))
+                fingerprint.update(f'{symbol}/{interval}/{ceil_to_interval(to_ms(start_time), interval)}/'
+                                   f'{floor_to_interval(to_ms(end_time), interval)}/'
+                                   f'{stat.st_size}/{stat.st_mtime_ns}'.encode())
+        return fingerprint.hexdigest()
+
+    @staticmethod
+    def strategy_version(strategy_class):
+        """
+        :return: the `VERSION` attribute of the strategy (if it has one) and a hash of its source code
+        """
+        source = hashlib.sha256()
+        for cls in inspect.getmro(strategy_class):
+            if cls is object:
+                continue
+            try:
+                source.update(inspect.getsource(cls).encode())
+            except (OSError, TypeError):
+                source.update(cls.__qualname__.encode())
+        return f'{getattr(strategy_class, "VERSION", None)}/{source.hexdigest()}'
+
+    def key(self, data_fingerprint, strategy_class, **params):
+        """
+        :param data_fingerprint: see `SimulationCache.data_fingerprint`
+        :param strategy_class: the class of the simulated strategy
+        :param params: all of the parameters of the simulation by their names
+        :return: stable key of the simulation result
+        """
+        description = {
+            'data': data_fingerprint,
+            'strategy': f'{strategy_class.__module__}.{strategy_class.__qualname__}',
+            'version': SimulationCache.strategy_version(strategy_class),
+            'params': params,
+        }
+        description = json.dumps(description, sort_keys=True, default=repr)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def __path(self, key):
+        return os.path.join(self.root, key[:2], f'{key}.pkl')
+
+    def get(self, key, default=None):
+        path = self.__path(key)
+        try:
+            with open(path, 'rb') as fh:
+                result = pickle.load(fh)
+        except FileNotFoundError:
+            return default
+        # the modification time is used as the last use time of the result
+        os.utime(path)
+        return result
+
+    def __contains__(self, key):
+        return os.path.exists(self.__path(key))
+
+    def put(self, key, result):
+        """
+        Save the result atomically, readers see the old file or the complete new one and never a partial file.
+        """
+        path = self.__path(key)
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                pickle.dump(result, fh)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        # the other processes that share the cache put results too, so the size is scanned and not tracked
+        entries = self.__entries()
+        if sum(size for _, size, _ in entries) > self.max_size:
+            self.__evict(entries)
+
+    def __entries(self):
+        """
+        :return: list of (last use time, size, path) of all the cached results
+        """
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for folder in os.scandir(self.root):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith('.pkl'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        # evicted by another process
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def __evict(self, entries):
+        """
+        Remove the least recently used results until the cache is below `EVICTION_RATIO` of its maximum size
+        :param entries: see `SimulationCache.__entries`
+        """
+        size = sum(entry_size for _, entry_size, _ in entries)
+        # leave some free space so not every next put will evict
+        target_size = self.max_size * SimulationCache.EVICTION_RATIO
+        for _, entry_size, path in sorted(entries):
+            if size <= target_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
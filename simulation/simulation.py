@@ -1,5 +1,3 @@
-import os
-import pickle
 import asyncio
 
 import pandas as pd
@@ -7,11 +5,16 @@ import pandas as pd
 from binance import Client
 from typing import Iterable
 
+from binance_bot_simulation.exchange_bots.market_data import MarketData
 from binance_bot_simulation.exchange_bots.strategy import Strategy
-from common import mkdirs, timing
-from binance_bot_simulation.exchange_bots.portfolio import InitialPortfolio
+from binance_bot_simulation.simulation.data_feed import ColumnarFeed, merge_feeds
+from binance_bot_simulation.simulation.intrabar import IntrabarCandles
+from binance_bot_simulation.simulation.result_cache import SimulationCache
+from common import timing
+from binance_bot_simulation.exchange_bots.portfolio import InitialPortfolio, Portfolio
 from binance_bot_simulation.simulation.simulation_exchange_bot import SimulationExchangeBot
-from binance_bot_simulation.binance.binance_download_data import download_data, change_df_types
+from binance_bot_simulation.binance.kline_store import KlineStore
+from binance_bot_simulation.binance.binance_download_data import download_data
 from common.plot import plot_simulation
 
 
@@ -21,82 +24,186 @@ class Simulation:
     it has a the simulation loop which is got over all the received data that it simulated and start sending the candles
     in order, one by one using the simulator clock.
     If more than 1 DataFrame has received as argument than the simulation of the graph will be simultaneously call them
+    Several strategies can be simulated together, each one has its own exchange and portfolio, and they share the
+    candles and the indicators, so the data is merged and recorded once for all of them.
     """
 
     def __init__(self,
                  simulation_start_time: pd.Timestamp = None,
-                 verbose=True):
+                 verbose=True,
+                 synchronous=True,
+                 history_mode=Portfolio.FULL_HISTORY,
+                 intrabar_candles: IntrabarCandles = None):
+        """
+        :param simulation_start_time: candles before this time are history for the strategy preparation
+        :param verbose: print the progress of the simulation
+        :param synchronous: run the candles loop without awaiting the exchange on each candle,
+                            the results are the same as the asynchronous loop but much faster.
+        :param history_mode: how the portfolio keeps its history, Portfolio.EVENT_HISTORY keeps only the changes
+                             of the state, the prices of the candle coins are still logged on each tick, so it saves
+                             the memory of the columns that don't change on a tick (amounts, average prices and
+                             balances) and the saving grows with the number of coins of the portfolio
+        :param intrabar_candles: lower interval candles from the kline store, to find the order of the fills in
+                                 candles that reached orders both above and below their open price
+        """
         self.verbose = verbose
+        self.synchronous = synchronous
         self.simulation_data_feeds = {}
         self.simulation_start_time = simulation_start_time
-        self.exchange = SimulationExchangeBot()
-        
+        self.history_mode = history_mode
+        self.intrabar_candles = intrabar_candles
+        self.market_data = MarketData()
+        # an exchange for each strategy, all of them over the market data of the simulation
+        self.exchanges = [SimulationExchangeBot(history_mode, intrabar_candles, self.market_data)]
+        self.initial_coins = None
+
     def create_portfolio(self, **coins):
-        self.exchange.create_portfolio(self.simulation_start_time, **coins)
+        """
+        Create the portfolio of each strategy, the strategies that are added after it get the same portfolio
+        """
+        self.initial_coins = coins
+        for exchange in self.exchanges:
+            exchange.create_portfolio(self.simulation_start_time, self.__first_prices(), **coins)
+
+    @property
+    def exchange(self):
+        """
+        :return: the exchange of the first strategy
+        """
+        return self.exchanges[0]
 
     @property
     def portfolio(self):
         return self.exchange.portfolio
 
-    def add_data_feed(self, coin: str, interval: str, data_feed: pd.DataFrame):
+    @property
+    def portfolios(self):
+        """
+        :return: the portfolios of the strategies, in the order they were added
+        """
+        return [exchange.portfolio for exchange in self.exchanges]
+
+    def add_data_feed(self, coin: str, interval: str, data_feed: pd.DataFrame, history: pd.DataFrame = None):
+        """
+        :param data_feed: the candles of coin/interval, the candles before the simulation start time are used as history
+        :param history: history for the strategy preparation, if it is given data_feed is simulated as is
+        """
         if coin not in self.simulation_data_feeds:
             self.simulation_data_feeds[coin] = {}
         if interval in self.simulation_data_feeds[coin]:
             raise ValueError(f'{coin}/{interval} is already in the simulation.')
-        self.simulation_data_feeds[coin][interval] = data_feed.loc[data_feed.index >= self.simulation_start_time]
-        self.exchange.add_history(coin, interval, data_feed.loc[data_feed.index < self.simulation_start_time])
+        if history is None:
+            history = data_feed.loc[data_feed.index < self.simulation_start_time]
+            data_feed = data_feed.loc[data_feed.index >= self.simulation_start_time]
+        self.simulation_data_feeds[coin][interval] = data_feed
+        self.market_data.add_history(coin, interval, history)
 
     def add_strategy(self, strategy: Strategy):
-        self.exchange.set_strategy(strategy)
+        """
+        Add a strategy to the simulation, each strategy is simulated with its own exchange and portfolio
+        :return: the exchange of the strategy
+        """
+        exchange = self.exchanges[-1]
+        if exchange.strategy is not None:
+            exchange = SimulationExchangeBot(self.history_mode, self.intrabar_candles, self.market_data)
+            if self.initial_coins is not None:
+                exchange.create_portfolio(self.simulation_start_time, self.__first_prices(), **self.initial_coins)
+            self.exchanges.append(exchange)
+        exchange.set_strategy(strategy)
+        return exchange
+
+    def __first_prices(self):
+        """
+        :return: dictionary of coin to the close price of its first simulated candle, the portfolio starts in these
+                 prices when the coin doesn't have history candles
+        """
+        prices = {}
+        for coin, dfs in self.simulation_data_feeds.items():
+            dfs = [df for df in dfs.values() if len(df) > 0]
+            if dfs:
+                first_df = min(dfs, key=lambda df: df.index[0])
+                prices[coin] = first_df['Close'].iloc[0]
+        return prices
 
     def start(self):
         """
         start the simulation loop,
         The simulation create a loop with tick on the smallest dataframe interval.
+        :return: the spot order book of the strategy, and DataFrame of the candles of all the data feeds sorted in the
+                 order of the loop
         """
+        if self.synchronous:
+            return self.sync_start()
 
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(self.async_start())
+        return asyncio.run(self.async_start())
 
-    async def async_start(self):
-        await self.exchange.start()
+    def sync_start(self):
+        for exchange in self.exchanges:
+            exchange.prepare_strategy_sync()
+        self.market_data.release_history()
 
-        concatenate_df = []
-        for coin, dfs in self.simulation_data_feeds.items():
-            concatenate_df += list(dfs.values())
-        concatenate_df = pd.concat(concatenate_df)
-        concatenate_df = concatenate_df.rename_axis('Close time').sort_values(
-            by=['Close time', 'minutes_interval', 'Coin'],
-            ascending=[True, True, True])
+        feeds = self.__create_feeds()
+        total_ticks = sum(len(feed) for feed in feeds)
+        verbose_i = 0
+        if self.verbose:
+            self.__print_start(feeds, total_ticks)
+        record = self.market_data.record
+        on_candles = [exchange.on_candle_sync for exchange in self.exchanges]
+        for candle in merge_feeds(feeds):
+            interval = candle['interval']
+            record(interval, candle)
+            for on_candle in on_candles:
+                on_candle(interval, candle)
+
+            if self.verbose:
+                verbose_i += 1
+                self.__print_progress(verbose_i, total_ticks, candle)
+        return self.exchange.strategy.portfolio.spot_order_book, self.__concatenate_feeds()
 
-        total_ticks = len(concatenate_df)
+    async def async_start(self):
+        for exchange in self.exchanges:
+            await exchange.prepare_strategy()
+        self.market_data.release_history()
+
+        feeds = self.__create_feeds()
+        total_ticks = sum(len(feed) for feed in feeds)
         verbose_i = 0
         if self.verbose:
-            print_progress_bar(verbose_i, total_ticks,
-                               prefix=f'{concatenate_df.index[0]}: {self.exchange.portfolio.portfolio_worth():.2f}',
-                               suffix=str(self.exchange.portfolio),
-                               length=10)
-        for row in concatenate_df.itertuples():
-            candle = {
-                'Close': row.Close,
-                'High': row.High,
-                'Low': row.Low,
-                'Open': row.Open,
-                'Volume': row.Volume,
-                'isClose': row.isClose,
-                'interval': row.interval,
-                'Close time': row.Index,
-                'Coin': row.Coin
-            }
-            await self.exchange.record_candle(row.interval, candle)
+            self.__print_start(feeds, total_ticks)
+        for candle in merge_feeds(feeds):
+            interval = candle['interval']
+            self.market_data.record(interval, candle)
+            for exchange in self.exchanges:
+                await exchange.on_candle(interval, candle)
 
             if self.verbose:
                 verbose_i += 1
-                print_progress_bar(verbose_i, total_ticks,
-                                   prefix=f'{candle["Close time"]}: {self.exchange.portfolio.portfolio_worth("BTC"):.2f}',
-                                   suffix=str(self.exchange.portfolio),
-                                   length=10)
-        return self.exchange.strategy.portfolio.spot_order_book, concatenate_df
+                self.__print_progress(verbose_i, total_ticks, candle)
+        return self.exchange.strategy.portfolio.spot_order_book, self.__concatenate_feeds()
+
+    def __create_feeds(self):
+        return [ColumnarFeed(df) for dfs in self.simulation_data_feeds.values() for df in dfs.values()]
+
+    def __concatenate_feeds(self):
+        """
+        :return: DataFrame of the candles of all the feeds in the order that the simulation went over them
+        """
+        concatenate_df = pd.concat([df for dfs in self.simulation_data_feeds.values() for df in dfs.values()])
+        return concatenate_df.rename_axis('Close time').sort_values(by=['Close time', 'minutes_interval', 'Coin'],
+                                                                    kind='stable')
+
+    def __print_start(self, feeds, total_ticks):
+        first_close_time = min(feed.columns['Close time'][0] for feed in feeds if len(feed) > 0)
+        print_progress_bar(0, total_ticks,
+                           prefix=f'{first_close_time}: {self.exchange.portfolio.portfolio_worth():.2f}',
+                           suffix=str(self.exchange.portfolio),
+                           length=10)
+
+    def __print_progress(self, verbose_i, total_ticks, candle):
+        print_progress_bar(verbose_i, total_ticks,
+                           prefix=f'{candle["Close time"]}: {self.exchange.portfolio.portfolio_worth("BTC"):.2f}',
+                           suffix=str(self.exchange.portfolio),
+                           length=10)
 
     def plot(self, coin=None, interval=None,
              spot_orders_plot=False,
@@ -114,12 +221,12 @@ class Simulation:
 
         spot_order_book = None
         if spot_orders_plot:
-            spot_order_book = pd.DataFrame(self.portfolio.spot_order_book)
+            spot_order_book = self.portfolio.spot_order_book.to_frame()
             spot_order_book = spot_order_book.set_index('Time')
 
         future_order_book = None
         if future_orders_plot:
-            future_order_book = pd.DataFrame(self.portfolio.future_order_book)
+            future_order_book = self.portfolio.future_order_book.to_frame()
 
         coin_worth = None
         if strategy_worth_as_coin:
@@ -143,6 +250,69 @@ class Simulation:
                         )
 
 
+def load_simulation_data(coins: Iterable,
+                         quoted: str,
+                         train_size: float,
+                         strategy_class,
+                         start_time: pd.Timestamp,
+                         end_time: pd.Timestamp,
+                         verbose=True,
+                         kline_store: KlineStore = None,
+                         base_interval: str = None):
+    """
+    Load the klines of all the intervals that the strategy needs and split them to train and test data
+    :param kline_store: the store of the klines, the default is the store in 'cache/klines'
+    :param base_interval: load only this interval and resample the other intervals from it
+    :return: tuple of train and test data frames, as dictionary of { coin: { interval: df } }
+    """
+    train_dfs = {}
+    test_dfs = {}
+    intervals = strategy_class.get_train_and_test_intervals()
+    for coin in coins:
+        dfs = download_data(coins=[coin],
+                            quoted=quoted,
+                            start_time=start_time,
+                            end_time=end_time,
+                            verbose=verbose,
+                            intervals=intervals,
+                            kline_store=kline_store,
+                            base_interval=base_interval)[coin]
+        train_dfs[coin] = {interval: df.iloc[:int(train_size * len(df))] for interval, df in dfs.items()}
+        test_dfs[coin] = {interval: df.iloc[int(train_size * len(df)):] for interval, df in dfs.items()}
+    return train_dfs, test_dfs
+
+
+def run_simulation(train_dfs,
+                   test_dfs,
+                   strategy_class,
+                   coins: Iterable,
+                   quoted: str,
+                   initial_portfolio: InitialPortfolio,
+                   verbose=True,
+                   **strategy_params):
+    """
+    Run a single simulation of a strategy over data that is already loaded
+    :param train_dfs: the history data for the strategy preparation as { coin: { interval: df } }
+    :param test_dfs: the simulated data as { coin: { interval: df } }
+    :return: the simulation after it ended
+    """
+    close_time = max(df.index[-1] for dfs in train_dfs.values() for df in dfs.values())
+    simulation = Simulation(simulation_start_time=close_time, verbose=verbose)
+    for coin, dfs in test_dfs.items():
+        for interval, df in dfs.items():
+            simulation.add_data_feed(coin, interval, df, history=train_dfs[coin][interval])
+    simulation.create_portfolio(**initial_portfolio.init_portfolio)
+    simulation.add_strategy(strategy_class(coins=coins, quoted=quoted, **strategy_params))
+    simulation.start()
+    return simulation
+
+
+def default_initial_portfolio(coins: Iterable, quoted: str):
+    initial_portfolio = {coin: 0 for coin in coins}
+    initial_portfolio[quoted] = 10000
+    return InitialPortfolio(**initial_portfolio)
+
+
 @timing
 def full_simulation(coins: Iterable,
                     quoted: str,
@@ -154,93 +324,88 @@ def full_simulation(coins: Iterable,
                     simulation_data_df=Client.KLINE_INTERVAL_1DAY,
                     verbose=True,
                     save_pickle=True,
+                    simulation_cache: SimulationCache = None,
+                    kline_store: KlineStore = None,
                     **strategy_params):
+    """
+    Load the data and simulate the strategy on it
+    :param save_pickle: use the cache of the simulations results
+    :param simulation_cache: the cache of the results, the default is the cache in 'cache/simulation'
+    :param kline_store: the store of the klines, the default is the store in 'cache/klines'
+    :return: the spot order book, the portfolio, the simulated data frame of the first coin and the simulation
+             (the simulation is None when the result is loaded from the cache)
+    """
     if end_time is None:
-        end_time = pd.Timestamp.now()
+        end_time = pd.Timestamp.now('UTC').tz_localize(None)
     if initial_portfolio is None:
-        initial_portfolio = {coin: 0 for coin in coins}
-        initial_portfolio[quoted] = 10000
-        initial_portfolio = InitialPortfolio(**initial_portfolio)
-
-    cache_folder_name = f'{coins}_{quoted}_{start_time}_{end_time}_{train_size}_{strategy_class.__name__}'
-    cache_folder_name = "".join(x for x in cache_folder_name if x.isalnum())
-    cache_file_name = ''
-    for param in strategy_params.values():
-        cache_file_name = f'{cache_file_name}_{param}'
-
-    cache_file_name = "".join(x for x in cache_file_name if x.isalnum())
-    try:
-        if save_pickle:
-            mkdirs(f'cache/simulation/{cache_folder_name}')
-            with open(f'cache/simulation/{cache_folder_name}/{cache_file_name}.pkl', 'rb') as fh:
-                return pickle.load(fh)
-    except FileNotFoundError:
-        pass
-
-    train_dfs = {}
-    test_dfs = {}
-    close_time = pd.Timestamp(year=2000, month=1, day=1)
-    for coin in coins:
-        if os.path.exists(f'cache/{coin + quoted}/All_Time'):
-            train_data = {}
-            test_data = {}
-            for interval in strategy_class.get_train_and_test_intervals():
-                df = pd.read_csv(f'cache/{coin + quoted}/All_Time/{interval}.csv')
-                change_df_types(df)
-                df = df.loc[(df.index > start_time) & (df.index < end_time)]
-                train_data[interval] = df.iloc[:int(train_size * len(df))]
-                test_data[interval] = df.iloc[int(train_size * len(df)):]
-        else:
-            train_data, test_data = download_data(coin=coin,
-                                                  quoted=quoted,
-                                                  start_time=start_time,
-                                                  end_time=end_time,
-                                                  train_size=train_size,
-                                                  verbose=verbose,
-                                                  train_n_test_intervals=strategy_class.get_train_and_test_intervals(),
-                                                  train_intervals=strategy_class.get_train_intervals(),
-                                                  test_intervals=strategy_class.get_test_intervals())
-        train_dfs[coin] = train_data
-        test_dfs[coin] = test_data
-
-        close_time = max(*(df.index[-1] for df in train_dfs[coin].values()), close_time)
-
-    coins_prices = {quoted: 1}
-    for coin, train_df in train_dfs.items():
-        for df in train_df.values():
-            try:
-                coin_price = df.loc[close_time, "Close"]
-                coins_prices[coin] = coin_price
-                break
-            except KeyError:
-                pass
-    initial_portfolio = initial_portfolio.set_prices(**coins_prices)
-    exchange = SimulationExchangeBot(train_dfs,
-                                     close_time,
-                                     **initial_portfolio)
-
-    strategy = strategy_class(exchange=exchange,
-                              coins=coins,
-                              quoted=quoted,
-                              **strategy_params)
-
-    simulation = Simulation(strategy=strategy,
-                            simulation_data=test_dfs,
-                            verbose=verbose)
-
-    simulation.start()
-    order_book = exchange.portfolio.spot_order_book
-
-    df = simulation.simulation_data['BTC'][simulation_data_df]
-    portfolio = exchange.portfolio
+        initial_portfolio = default_initial_portfolio(coins, quoted)
+    if simulation_cache is None:
+        simulation_cache = SimulationCache()
+    if kline_store is None:
+        kline_store = KlineStore()
+    coins = list(coins)
+    cache_params = {
+        'initial_portfolio': initial_portfolio.init_portfolio,
+        'simulation_data_df': simulation_data_df,
+        'strategy_params': strategy_params,
+    }
+
+    # the result of a request that the store already covers is found without loading and hashing the data
+    if save_pickle:
+        request_key = _request_cache_key(simulation_cache, kline_store, coins, quoted, train_size, strategy_class,
+                                         start_time, end_time, **cache_params)
+        if request_key is not None:
+            cache_key = simulation_cache.get(request_key)
+            result = simulation_cache.get(cache_key) if cache_key is not None else None
+            if result is not None:
+                return (*result, None)
+
+    train_dfs, test_dfs = load_simulation_data(coins, quoted, train_size, strategy_class, start_time, end_time,
+                                               verbose=verbose, kline_store=kline_store)
+    cache_key = None
+    if save_pickle:
+        cache_key = simulation_cache.key(SimulationCache.data_fingerprint(train_dfs, test_dfs),
+                                         strategy_class,
+                                         **cache_params)
+        # the data is in the store now, the next same request finds the result by the request
+        request_key = _request_cache_key(simulation_cache, kline_store, coins, quoted, train_size, strategy_class,
+                                         start_time, end_time, **cache_params)
+        if request_key is not None:
+            simulation_cache.put(request_key, cache_key)
+        result = simulation_cache.get(cache_key)
+        if result is not None:
+            return (*result, None)
+
+    simulation = run_simulation(train_dfs, test_dfs, strategy_class, coins, quoted, initial_portfolio,
+                                verbose=verbose, **strategy_params)
+    order_book = simulation.portfolio.spot_order_book
+
+    df = simulation.simulation_data_feeds[next(iter(coins))][simulation_data_df]
+    portfolio = simulation.portfolio
 
     result = (order_book, portfolio, df)
     if save_pickle:
-        with open(f'cache/simulation/{cache_folder_name}/{cache_file_name}.pkl', 'wb') as fh:
-            pickle.dump(result, fh)
+        simulation_cache.put(cache_key, result)
     return order_book, portfolio, df, simulation
 
 
+def _request_cache_key(simulation_cache: SimulationCache, kline_store: KlineStore, coins, quoted, train_size,
+                       strategy_class, start_time, end_time, **params):
+    """
+    :return: key of the simulation request that the store covers, the data of the request is fingerprinted by the
+             store files, None if the store doesn't cover the request
+    """
+    store_fingerprint = SimulationCache.store_fingerprint(kline_store,
+                                                          [coin + quoted for coin in coins],
+                                                          strategy_class.get_train_and_test_intervals(),
+                                                          start_time,
+                                                          end_time)
+    if store_fingerprint is None:
+        return None
+    return simulation_cache.key(store_fingerprint, strategy_class, result='request', coins=coins, quoted=quoted,
+                                train_size=train_size, **params)
+
+
 # Print iterations progress
 def print_progress_bar(iteration, total, prefix='', suffix='', decimals=1, length=100, fill='█', printEnd="\r"):
     """
@@ -1,17 +1,56 @@
-import pandas as pd
-
 from binance_bot_simulation.exchange_bots.orders import Order
 from binance_bot_simulation.exchange_bots.portfolio import Portfolio
 from binance_bot_simulation.exchange_bots.exchange_bot import ExchangeBot
+from binance_bot_simulation.exchange_bots.market_data import MarketData
+from binance_bot_simulation.binance.kline_store import interval_minutes
+from binance_bot_simulation.simulation.intrabar import IntrabarCandles
+from binance_bot_simulation.simulation.matching_engine import MatchingEngine
 
 
 class SimulationExchangeBot(ExchangeBot):
 
-    def __init__(self):
-        super().__init__()
-        self.__open_orders = []
+    def __init__(self,
+                 history_mode=Portfolio.FULL_HISTORY,
+                 intrabar_candles: IntrabarCandles = None,
+                 market_data: MarketData = None):
+        """
+        :param history_mode: how the portfolio keeps its history, Portfolio.FULL_HISTORY or Portfolio.EVENT_HISTORY
+        :param intrabar_candles: lower interval candles to find the order of the fills in a candle that reached orders
+                                 both above and below its open price, if None these fills are ordered by their
+                                 distance from the open price
+        :param market_data: market data that is shared with the exchanges of other strategies in the simulation
+        """
+        super().__init__(market_data=market_data)
+        self.history_mode = history_mode
+        self.intrabar_candles = intrabar_candles
+        self.__market_orders = []
+        # limit and stop orders that were set in the current candle, they rest in the matching engine from the next one
+        self.__new_resting_orders = []
+        self.matching_engine = MatchingEngine()
+        # the resting orders of a coin are matched against the candles of its lowest interval
+        self.match_intervals = {}
+
+    async def prepare_strategy(self):
+        self.__set_match_intervals()
+        await super().prepare_strategy()
 
-    def create_portfolio(self, timestamp, **coins):
+    def prepare_strategy_sync(self):
+        self.__set_match_intervals()
+        super().prepare_strategy_sync()
+
+    def __set_match_intervals(self):
+        for coin, interval in self.candles:
+            if (coin not in self.match_intervals or
+                    interval_minutes(interval) < interval_minutes(self.match_intervals[coin])):
+                self.match_intervals[coin] = interval
+
+    def create_portfolio(self, timestamp, feed_prices=None, **coins):
+        """
+        :param timestamp: the time that the portfolio starts in
+        :param feed_prices: dictionary of coin to its price in the first candle of the simulation, for the coins that
+                            don't have history candles
+        :param coins: key-arg of coins and their amounts
+        """
         # coins_prices = {}
         # for coin, train_df in self.history_data.items():
         #     for df in train_df.values():
@@ -24,45 +63,86 @@ class SimulationExchangeBot(ExchangeBot):
         # initial_portfolio = initial_portfolio.set_prices(**coins_prices)
         coins_prices = {}
         for coin in coins:
-            try:
-                coins_prices[coin] = min(
-                    [self.ohlc['Close'][coin][interval][-1] for interval in self.ohlc['Close'][coin]])
-            except KeyError:
-                # the quoted value price
-                coins_prices[coin] = 1
+            prices = [self.close(coin, interval)[-1] for (candles_coin, interval), candles in self.candles.items()
+                      if candles_coin == coin and len(candles) > 0]
+            if not prices and feed_prices is not None and coin in feed_prices:
+                prices = [feed_prices[coin]]
+            # the quoted coin doesn't have candles, its value price is 1
+            coins_prices[coin] = min(prices) if prices else 1
 
         coins = {coin: (amount, coins_prices[coin]) for coin, amount in coins.items()}
-        self.portfolio = Portfolio(timestamp, 0.1 / 100, **coins)
+        quoted = self.strategy.quoted if self.strategy is not None else 'USDT'
+        self.portfolio = Portfolio(timestamp, 0.1 / 100, history_mode=self.history_mode, quoted=quoted, **coins)
 
     @property
     def open_orders(self):
         """
         :return: all of the open orders that this exchange use.
         """
-        return self.__open_orders
+        return self.__market_orders + self.__new_resting_orders + self.matching_engine.orders()
 
     def cancel_all_orders(self, timestamp):
         """
          cancel all open orders
         """
         super().cancel_all_orders(timestamp)
-        self.__open_orders.clear()
+        self.__market_orders.clear()
+        self.__new_resting_orders.clear()
+        self.matching_engine.clear()
 
     async def _set_order(self, order):
+        self._set_order_sync(order)
+
+    def _set_order_sync(self, order):
         """
         Add new order to the open orders
         :param order: the order tobe added
         """
-        self.open_orders.append(order)
+        if order.order_type == Order.MARKET:
+            self.__market_orders.append(order)
+        else:
+            self.__new_resting_orders.append(order)
 
     async def _close_future_position(self, timestamp, coin, size, curr_price):
+        self._close_future_position_sync(timestamp, coin, size, curr_price)
+
+    def _close_future_position_sync(self, timestamp, coin, size, curr_price):
         self.portfolio.close_future_position(timestamp, coin, size, curr_price)
 
-    def update_orders(self, timestamp: pd.Timestamp, price: float):
-        for order in self.open_orders:
-            if order.order_type == Order.MARKET:
-                order.total_filled = 1  # all of the order filled in market trades
-                order.price = price
-                self.portfolio.on_order_filled(order, timestamp)
-        # remove all orders that fulfilled
-        self.__open_orders = [order for order in self.open_orders if order.total_filled < 1]
+    def update_orders(self, candle):
+        """
+        Fill the resting orders that the candle reached and the market orders in the candle close price
+        """
+        timestamp = candle['Close time']
+        coin = candle['Coin']
+        if len(self.matching_engine) > 0 and self.match_intervals.get(coin) == candle['interval']:
+            self.__match(candle)
+
+        for order in self.__market_orders:
+            self.__fill(order, timestamp, candle['Close'])
+        self.__market_orders.clear()
+
+        for order in self.__new_resting_orders:
+            self.matching_engine.add(order)
+        self.__new_resting_orders.clear()
+
+    def __match(self, candle):
+        timestamp = candle['Close time']
+        coin = candle['Coin']
+        bar = None
+        if (self.intrabar_candles is not None and
+                self.matching_engine.is_ambiguous(coin, candle['Open'], candle['High'], candle['Low'])):
+            bar = self.intrabar_candles.candles(coin + self.strategy.quoted, timestamp,
+                                                interval_minutes(candle['interval']))
+        if bar is None:
+            bar = ([candle['Open']], [candle['High']], [candle['Low']])
+        # the fills are in the time of the candle, the lower interval candles only decide their order and prices
+        for open_price, high, low in zip(*bar):
+            for order, price in self.matching_engine.match(coin, open_price, high, low):
+                self.__fill(order, timestamp, price)
+
+    def __fill(self, order, timestamp, price):
+        order.total_filled = 1  # all of the order filled in market trades
+        order.price = price
+        self.portfolio.on_order_filled(order, timestamp)
+        order.filled(order, timestamp, price, order.amount)
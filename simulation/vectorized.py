@@ -0,0 +1,172 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+from binance_bot_simulation.exchange_bots.order_book import OrderBook
+from binance_bot_simulation.exchange_bots.orders import SpotOrder
+
+
+class SignalStrategy(ABC):
+    """
+    Strategy that is a function of the candles, it gives the target weights of its coins for all of the candles at once
+    instead of setting orders in each candle, so it can be simulated by `vectorized_backtest` much faster than by
+    `Simulation`.
+    """
+
+    def __init__(self, coins, quoted, interval, **params):
+        """
+        :param coins: the coins that the strategy trades
+        :param quoted: the coin that the coins are bought with
+        :param interval: the interval of the candles that the strategy works on
+        :param params: the parameters of the strategy
+        """
+        self.coins = coins
+        self.quoted = quoted
+        self.interval = interval
+        self.params = params
+
+    @abstractmethod
+    def target_weights(self, dfs) -> pd.DataFrame:
+        """
+        :param dfs: dictionary of coin to its candles DataFrame in the interval of the strategy,
+                    all of them have the same index of the candles close times
+        :return: DataFrame with the same index and a column for each coin, the part of the portfolio worth that should
+                 be in the coin after the candle closed, NaN to keep the coin amount as it is.
+                 the value of a candle can only depend on the candles until it.
+        """
+        pass
+
+
+class VectorizedResult:
+    """
+    The results of `vectorized_backtest`, in the same format as the portfolio of a simulation
+    """
+
+    def __init__(self, spot_order_book: OrderBook, history: pd.DataFrame, worth: pd.Series, fees):
+        """
+        :param spot_order_book: the filled orders, as `Portfolio.spot_order_book`
+        :param history: the state of the portfolio after each candle, as `Portfolio.history()`
+        :param worth: the worth of the portfolio after each candle
+        :param fees: the fees of the orders, they are not taken from the portfolio, the same as in `Portfolio`
+        """
+        self.spot_order_book = spot_order_book
+        self.history = history
+        self.worth = worth
+        self.fees = fees
+
+    def portfolio_worth(self):
+        """
+        :return: the worth of the portfolio after the last candle, NaN if there were no candles
+        """
+        return self.worth.iloc[-1] if len(self.worth) > 0 else np.nan
+
+
+def _changed_rows(weights: np.ndarray) -> np.ndarray:
+    """
+    :return: indices of the rows that their weights are different from the row before them
+    """
+    if len(weights) == 0:
+        return np.empty(0, dtype=np.int64)
+    known = ~np.isnan(weights)
+    changed = np.empty(len(weights), dtype=bool)
+    changed[0] = known[0].any()
+    same = (weights[1:] == weights[:-1]) | (~known[1:] & ~known[:-1])
+    changed[1:] = ~same.all(axis=1)
+    return np.flatnonzero(changed)
+
+
+def vectorized_backtest(dfs, strategy: SignalStrategy, initial_portfolio) -> VectorizedResult:
+    """
+    Simulate the target weights of a signal strategy.
+    The orders are market orders in the close price of the candle that the weights changed in, and the portfolio is
+    changed only in these candles, so the loop goes over the changes of the weights and not over the candles.
+    The orders follow the rules of the simulation exchange: sells before buys, and orders under 20 in the quoted coin
+    are not set.
+    :param dfs: dictionary of coin to its candles DataFrame in the interval of the strategy, indexed by 'Close time'
+    :param initial_portfolio: dictionary of coin to its initial amount, the quoted coin included
+    :return: the results of the backtest
+    """
+    coins = list(strategy.coins)
+    quoted = strategy.quoted
+    closes = pd.concat({coin: dfs[coin]['Close'] for coin in coins}, axis=1, join='inner')
+    dfs = {coin: dfs[coin].loc[closes.index] for coin in coins}
+    weights = strategy.target_weights(dfs).reindex(index=closes.index, columns=coins).to_numpy(np.float64)
+    prices = closes.to_numpy(np.float64)
+    times = closes.index
+
+    amounts = np.array([initial_portfolio.get(coin, 0) for coin in coins], dtype=np.float64)
+    # the feeds can have no common candles, then there are no orders and the history is empty
+    first_prices = prices[0] if len(prices) > 0 else np.full(len(coins), np.nan)
+    avg_prices = first_prices.copy()
+    quoted_amount = float(initial_portfolio.get(quoted, 0))
+
+    changed_rows = _changed_rows(weights)
+    # the state after the orders of each changed row
+    amounts_states = np.empty((len(changed_rows), len(coins)))
+    avg_prices_states = np.empty((len(changed_rows), len(coins)))
+    quoted_states = np.empty(len(changed_rows))
+
+    order_book = OrderBook.spot()
+    order_id = 0
+    fees = 0.0
+    for state, row in enumerate(changed_rows):
+        row_prices = prices[row]
+        row_weights = weights[row]
+        worth = quoted_amount + amounts @ row_prices
+        targets = np.where(np.isnan(row_weights), amounts, row_weights * worth / row_prices)
+        trades = targets - amounts
+        # sell first to have the quoted amount for the buys
+        for i in list(np.flatnonzero(trades < 0)) + list(np.flatnonzero(trades > 0)):
+            amount = abs(trades[i])
+            price = row_prices[i]
+            if amount * price < 20:
+                continue
+            if trades[i] > 0:
+                side = SpotOrder.BUY
+                percent = amount * price / quoted_amount if quoted_amount > 0 else 0
+                avg_prices[i] = (avg_prices[i] * amounts[i] + amount * price) / (amounts[i] + amount)
+                amounts[i] += amount
+                quoted_amount -= amount * price
+            else:
+                side = SpotOrder.SELL
+                percent = amount / amounts[i] if amounts[i] > 0 else 0
+                amounts[i] -= amount
+                quoted_amount += amount * price
+            fees += amount * price * SpotOrder.FEE
+            order_book.append({
+                'Id': order_id,
+                'Time': times[row],
+                'Coin': coins[i],
+                'Quoted Symbol': quoted,
+                'Amount': amount,
+                'Price': price,
+                'Side': side,
+                'filled': 1,
+                'Percent': percent
+            })
+            order_id += 1
+        amounts_states[state] = amounts
+        avg_prices_states[state] = avg_prices
+        quoted_states[state] = quoted_amount
+
+    # the state of each candle is the state of the last change until it
+    initial_amounts = np.array([initial_portfolio.get(coin, 0) for coin in coins], dtype=np.float64)
+    states = np.searchsorted(changed_rows, np.arange(len(times)), side='right') - 1
+    amounts_states = np.vstack([initial_amounts, amounts_states])[states + 1]
+    avg_prices_states = np.vstack([first_prices, avg_prices_states])[states + 1]
+    quoted_states = np.r_[float(initial_portfolio.get(quoted, 0)), quoted_states][states + 1]
+
+    history = {}
+    for i, coin in enumerate(coins):
+        history[f'{coin} Amount'] = amounts_states[:, i]
+        history[f'{coin} A. Price'] = avg_prices_states[:, i]
+        history[f'{coin} Price'] = prices[:, i]
+    history[f'{quoted} Amount'] = quoted_states
+    history[f'{quoted} A. Price'] = 1.0
+    history[f'{quoted} Price'] = 1.0
+    history['Future margin balance'] = 0.0
+    history['Future unrealized PNL'] = 0.0
+    history = pd.DataFrame(history, index=times)
+    worth = pd.Series(quoted_states + (amounts_states * prices).sum(axis=1), index=times, name='Worth')
+    return VectorizedResult(order_book, history, worth, fees)
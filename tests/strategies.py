@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from binance_bot_simulation.exchange_bots.orders import MarketSpotOrder, SpotOrder
+from binance_bot_simulation.exchange_bots.strategy import Strategy
+
+
+def random_klines(coin, interval, minutes, n, seed, start='2021-01-01'):
+    """
+    :return: DataFrame of n klines of a random walk, in the format of the downloaded klines
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.random(n) * 0.01)
+    low = np.minimum(open_, close) * (1 - rng.random(n) * 0.01)
+    close_time = pd.date_range(start, periods=n, freq=f'{minutes}min') + pd.Timedelta(minutes=minutes)
+    df = pd.DataFrame({'Open time': close_time - pd.Timedelta(minutes=minutes), 'Open': open_, 'High': high,
+                       'Low': low, 'Close': close, 'Volume': rng.random(n) * 10,
+                       'Quote asset volume': rng.random(n), 'Number of trades': rng.integers(1, 100, n),
+                       'Taker buy base asset volume': rng.random(n), 'Taker buy quote asset volume': rng.random(n),
+                       'Coin': coin, 'interval': interval, 'minutes_interval': minutes, 'isClose': True},
+                      index=close_time)
+    df.index.name = 'Close time'
+    return df
+
+
+class CrossStrategy(Strategy):
+    """
+    Buy a coin when the mean of its last `fast` closes is above the mean of its last `slow` closes, and sell it when
+    it is below
+    """
+
+    def __init__(self, coins, quoted, fast=3, slow=8):
+        super().__init__(coins, quoted)
+        self.fast = fast
+        self.slow = slow
+
+    async def prepare_strategy(self):
+        pass
+
+    @Strategy.on_candle_close('15m')
+    def on_15m(self, interval, candle):
+        coin = candle['Coin']
+        close = self.exchange.close(coin, interval, self.slow)
+        if np.mean(close[-self.fast:]) > np.mean(close):
+            quoted_amount = self.portfolio.amount_of(self.quoted, 30)
+            if quoted_amount > 25:
+                self.exchange.set_order(MarketSpotOrder(candle['Close'], side=SpotOrder.BUY, coin=coin,
+                                                        quoted=self.quoted, amount=quoted_amount / candle['Close'],
+                                                        timestamp=candle['Close time']))
+        else:
+            amount = self.portfolio.amount_of(coin, 50)
+            if amount * candle['Close'] > 25:
+                self.exchange.set_order(MarketSpotOrder(candle['Close'], side=SpotOrder.SELL, coin=coin,
+                                                        quoted=self.quoted, amount=amount,
+                                                        timestamp=candle['Close time']))
@@ -0,0 +1,61 @@
+import asyncio
+
+import pandas as pd
+
+from binance_bot_simulation.binance.binance_download_data import download_raw_data
+from binance_bot_simulation.binance.kline_store import KlineStore, to_ms
+
+HOUR_MS = 60 * 60 * 1000
+
+
+class FakeDownloader:
+    """
+    Downloader of 1h klines that binance has only until `last_close`
+    """
+
+    def __init__(self, last_close: pd.Timestamp):
+        self.last_close = last_close
+        self.ranges = []
+
+    async def download(self, symbol, interval, start_time, end_time):
+        self.ranges.append((start_time, end_time))
+        first_open = -(-to_ms(start_time) // HOUR_MS) * HOUR_MS
+        last_open = min(to_ms(end_time), to_ms(self.last_close) - HOUR_MS)
+        return [[open_ms, '1', '2', '0.5', '1.5', '10', open_ms + HOUR_MS - 1, '15', 3, '5', '7.5', '0']
+                for open_ms in range(first_open, last_open + 1, HOUR_MS)]
+
+
+def download(kline_store, downloader, start_time, end_time):
+    return asyncio.run(download_raw_data(downloader, '1h', 'BTC', 'USDT', start_time, end_time,
+                                         kline_store=kline_store))
+
+
+def test_coverage_ends_at_the_last_downloaded_candle(tmp_path):
+    kline_store = KlineStore(str(tmp_path))
+    start_time = pd.Timestamp('2021-01-02')
+    end_time = pd.Timestamp('2021-01-03')
+    # the last candles of the range are not in binance yet
+    df = download(kline_store, FakeDownloader(pd.Timestamp('2021-01-02 12:00')), start_time, end_time)
+    assert len(df) == 12
+    assert kline_store.missing_ranges('BTCUSDT', '1h', start_time, end_time) == [
+        (pd.Timestamp('2021-01-02 12:00'), end_time)]
+
+    # the next download asks only for the candles that were missing and gets them
+    downloader = FakeDownloader(end_time)
+    df = download(kline_store, downloader, start_time, end_time)
+    assert downloader.ranges == [(pd.Timestamp('2021-01-02 12:00'), end_time)]
+    assert len(df) == 24
+    assert kline_store.covers('BTCUSDT', '1h', start_time, end_time)
+
+
+def test_future_end_time_is_not_covered(tmp_path):
+    kline_store = KlineStore(str(tmp_path))
+    now = pd.Timestamp.now('UTC').tz_localize(None)
+    start_time = now.floor('h') - pd.Timedelta(hours=5)
+    end_time = now + pd.Timedelta(days=2)
+    df = download(kline_store, FakeDownloader(now.floor('h')), start_time, end_time)
+
+    assert len(df) == 5
+    coverage_end = kline_store.coverage('BTCUSDT', '1h')[-1][1]
+    assert coverage_end <= to_ms(now)
+    assert not kline_store.covers('BTCUSDT', '1h', start_time, end_time)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from binance_bot_simulation.other.circular_queue import CircularQueue
+
+
+@pytest.mark.parametrize('maxlen, initial', [(1, 0), (5, 0), (5, 3), (5, 12), (16, 40)])
+def test_values_are_the_last_added(maxlen, initial):
+    rng = np.random.default_rng(maxlen + initial)
+    values = list(rng.random(initial))
+    queue = CircularQueue(values, maxlen)
+    for value in rng.random(3 * maxlen):
+        queue.enqueue(value)
+        values.append(value)
+        expected = values[-maxlen:]
+
+        array = queue.to_array()
+        assert list(array) == expected
+        assert array.flags.c_contiguous and not array.flags.writeable
+        assert queue.peek() == expected[0]
+        for n in [0, 1, maxlen // 2, maxlen, maxlen + 3]:
+            assert list(queue.last(n)) == expected[len(expected) - min(n, len(expected)):]
+        for index in range(-len(expected), len(expected)):
+            assert queue[index] == expected[index]
+        for key in [slice(1, None), slice(-3, -1), slice(None, None, 2), slice(2, 1)]:
+            assert list(queue[key]) == expected[key]
+
+
+def test_windows_are_views_of_the_same_buffer():
+    queue = CircularQueue(np.arange(8.), 8)
+    first = queue.last(4)
+    for value in range(8, 19):
+        queue.enqueue(float(value))
+        window = queue.last(4)
+        assert list(window) == [value - 3., value - 2., value - 1., float(value)]
+        assert not window.flags.owndata
+        assert np.shares_memory(window.base, first.base)
+
+
+def test_rows_have_contiguous_columns():
+    queue = CircularQueue(np.arange(12.).reshape(4, 3), 4)
+    queue.enqueue([12., 13., 14.])
+    window = queue.last(3)
+    assert window.tolist() == [[6., 7., 8.], [9., 10., 11.], [12., 13., 14.]]
+    assert window[:, 1].flags.c_contiguous
+    queue[-1] = [0., 0., 0.]
+    assert queue[-1].tolist() == [0., 0., 0.]
+    assert queue.last(1).tolist() == [[0., 0., 0.]]
+
+
+def test_max_length_must_be_positive():
+    with pytest.raises(ValueError):
+        CircularQueue([], 0)
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from binance_bot_simulation.exchange_bots.event_ledger import EventLedger
+from binance_bot_simulation.exchange_bots.ledger import Ledger
+from binance_bot_simulation.exchange_bots.portfolio import Portfolio
+from binance_bot_simulation.simulation.simulation import Simulation
+
+from strategies import CrossStrategy, random_klines
+
+
+def simulation_history(history_mode):
+    simulation = Simulation(simulation_start_time=pd.Timestamp('2021-01-03'), verbose=False,
+                            history_mode=history_mode)
+    for i, coin in enumerate(['BTC', 'ETH']):
+        simulation.add_data_feed(coin, '15m', random_klines(coin, '15m', 15, 1000, i))
+        simulation.add_data_feed(coin, '1h', random_klines(coin, '1h', 60, 250, 10 + i))
+    simulation.create_portfolio(BTC=0, ETH=0, USDT=10000)
+    simulation.add_strategy(CrossStrategy(['BTC', 'ETH'], 'USDT'))
+    simulation.start()
+    return simulation.portfolio
+
+
+def test_event_history_is_the_same_as_full_history():
+    full = simulation_history(Portfolio.FULL_HISTORY)
+    events = simulation_history(Portfolio.EVENT_HISTORY)
+
+    assert len(full.spot_order_book) > 0
+    pd.testing.assert_frame_equal(events.history(), full.history())
+    assert events.portfolio_worth() == full.portfolio_worth()
+
+
+@pytest.mark.parametrize('checkpoint_changes', [1, 3, 4096])
+def test_rebuilt_rows_are_the_ledger_rows(monkeypatch, checkpoint_changes):
+    monkeypatch.setattr(EventLedger, 'CHECKPOINT_CHANGES', checkpoint_changes)
+    start = pd.Timestamp('2021-01-01')
+    values = {'BTC Amount': 0., 'BTC Price': 100., 'USDT Amount': 1000.}
+    ledger, event_ledger = Ledger(start, **values), EventLedger(start, **values)
+    for i in range(1, 2000):
+        timestamp = start + pd.Timedelta(minutes=i)
+        for history in ledger, event_ledger:
+            history.new_row(timestamp)
+            history['BTC Price'] = 100. + i % 7
+            if i % 5 == 0:
+                history['BTC Amount'] += 1
+                history['USDT Amount'] -= history['BTC Price']
+
+    pd.testing.assert_frame_equal(event_ledger.to_frame(), ledger.to_frame())
+    pd.testing.assert_frame_equal(event_ledger.to_frame(100), ledger.to_frame(100))
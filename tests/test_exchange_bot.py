@@ -0,0 +1,49 @@
+import pandas as pd
+
+from binance_bot_simulation.exchange_bots.exchange_bot import ExchangeBot
+from binance_bot_simulation.exchange_bots.orders import MarketSpotOrder, SpotOrder
+
+
+class AsyncOnlyExchange(ExchangeBot):
+    """
+    Exchange that implements only the asynchronous methods, like an exchange of a real api
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.orders = []
+        self.closed_positions = []
+
+    @property
+    def open_orders(self):
+        return self.orders
+
+    def update_orders(self, candle):
+        pass
+
+    async def _set_order(self, order):
+        self.orders.append(order)
+
+    async def _close_future_position(self, timestamp, coin, size, curr_price):
+        self.closed_positions.append((coin, size))
+
+
+class AsyncStrategy:
+    prepared = False
+
+    async def prepare_strategy(self):
+        AsyncStrategy.prepared = True
+
+
+def test_synchronous_loop_runs_the_asynchronous_methods():
+    exchange = AsyncOnlyExchange()
+    exchange.strategy = AsyncStrategy()
+    exchange.prepare_strategy_sync()
+    assert AsyncStrategy.prepared
+
+    timestamp = pd.Timestamp('2021-01-01')
+    order = MarketSpotOrder(100., side=SpotOrder.BUY, coin='BTC', quoted='USDT', amount=1, timestamp=timestamp)
+    exchange.set_order(order)
+    exchange.update_sync({'Close time': timestamp})
+    assert exchange.orders == [order]
+    assert len(exchange.tasks) == 0
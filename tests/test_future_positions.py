@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from binance_bot_simulation.exchange_bots.orders import MarketFutureOrder, FutureOrder
+from binance_bot_simulation.exchange_bots.portfolio import Portfolio
+
+START = pd.Timestamp('2021-01-01')
+
+
+def candle(close, low=None, high=None):
+    return {'Coin': 'BTC', 'Close': close, 'Low': close if low is None else low, 'High': close if high is None else high}
+
+
+def portfolio():
+    return Portfolio(START, 0.1, BTC=(0, 100.), USDT=(10000, 1))
+
+
+@pytest.mark.parametrize('position, liquidation_candle', [
+    (FutureOrder.LONG, candle(95, low=89)),
+    (FutureOrder.SHORT, candle(105, high=111)),
+])
+def test_liquidation_loses_only_the_margin(position, liquidation_candle):
+    p = portfolio()
+    # 1000 USDT of BTC with leverage 10 takes 100 USDT of margin
+    p.on_order_filled(MarketFutureOrder(position, 'BTC', 10, 1000, 100.), START)
+    assert p.ledger['USDT Amount'] == pytest.approx(9900)
+    assert p.ledger['Future margin balance'] == pytest.approx(100)
+    assert p.portfolio_worth() == pytest.approx(10000)
+
+    p.update_history(START + pd.Timedelta('1h'), liquidation_candle)
+    assert 'BTCUSDT' not in p.future_positions
+    assert p.ledger['Future margin balance'] == pytest.approx(0)
+    assert p.ledger['Future unrealized PNL'] == pytest.approx(0)
+    assert p.ledger['USDT Amount'] == pytest.approx(10000 - 100)
+    assert p.portfolio_worth() == pytest.approx(10000 - 100)
+
+
+def test_closed_position_returns_its_margin_and_pnl():
+    p = portfolio()
+    p.on_order_filled(MarketFutureOrder(FutureOrder.LONG, 'BTC', 5, 1000, 100.), START)
+    timestamp = START + pd.Timedelta('1h')
+    p.update_history(timestamp, candle(110))
+    assert p.portfolio_worth() == pytest.approx(10000 + 100)
+
+    p.close_future_position(timestamp, 'BTCUSDT', 10, 110.)
+    assert len(p.future_positions) == 0
+    assert p.ledger['Future margin balance'] == pytest.approx(0)
+    assert p.ledger['USDT Amount'] == pytest.approx(10000 + 100)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from binance_bot_simulation.exchange_bots.indicators import SMA, EMA, RSI, ATR, BollingerBands
+from binance_bot_simulation.exchange_bots.strategy import Strategy
+from binance_bot_simulation.simulation.simulation import Simulation
+
+from strategies import random_klines
+
+KLINES = random_klines('BTC', '15m', 15, 3000, 0)
+# the values of the last candles that the indicators keep, the averages in them go on from the averages that were
+# warmed with the history before the simulation start
+WINDOW = 500
+
+
+class IndicatorsStrategy(Strategy):
+
+    async def prepare_strategy(self):
+        self.exchange.register_indicator('sma', 'BTC', '15m', SMA(20))
+        self.exchange.register_indicator('ema', 'BTC', '15m', EMA(20))
+        self.exchange.register_indicator('rsi', 'BTC', '15m', RSI(14))
+        self.exchange.register_indicator('atr', 'BTC', '15m', ATR(14))
+        self.exchange.register_indicator('bollinger', 'BTC', '15m', BollingerBands(20, 2))
+
+    @Strategy.on_candle_close('15m')
+    def on_15m(self, interval, candle):
+        pass
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    simulation = Simulation(simulation_start_time=pd.Timestamp('2021-01-20'), verbose=False)
+    simulation.add_data_feed('BTC', '15m', KLINES)
+    simulation.create_portfolio(BTC=0, USDT=10000)
+    simulation.add_strategy(IndicatorsStrategy(['BTC'], 'USDT'))
+    simulation.start()
+    return simulation.exchange
+
+
+def wilder(values: pd.Series, period):
+    """
+    :return: Wilder's smoothing of values, the first value is the simple average of the first `period` values
+    """
+    values = values.dropna()
+    first = values.iloc[:period].mean()
+    smoothed = pd.concat([pd.Series([first], index=values.index[period - 1:period]), values.iloc[period:]])
+    smoothed = smoothed.ewm(alpha=1 / period, adjust=False).mean()
+    return smoothed.reindex(KLINES.index)
+
+
+def indicator_window(exchange, name):
+    return exchange.indicator(name, 'BTC', '15m', WINDOW)
+
+
+def test_sma_and_bollinger_bands(exchange):
+    close = KLINES['Close']
+    sma = close.rolling(20).mean()
+    deviation = 2 * close.rolling(20).std(ddof=0)
+    bollinger = indicator_window(exchange, 'bollinger')
+
+    assert np.allclose(indicator_window(exchange, 'sma'), sma.iloc[-WINDOW:])
+    assert exchange.indicator('sma', 'BTC', '15m') == pytest.approx(sma.iloc[-1])
+    assert np.allclose(bollinger[:, 0], sma.iloc[-WINDOW:])
+    assert np.allclose(bollinger[:, 1], (sma + deviation).iloc[-WINDOW:])
+    assert np.allclose(bollinger[:, 2], (sma - deviation).iloc[-WINDOW:])
+
+
+def test_ema(exchange):
+    close = KLINES['Close']
+    # the ema starts from the simple average of the first 20 candles
+    ema = close.copy()
+    ema.iloc[19] = close.iloc[:20].mean()
+    ema = ema.iloc[19:].ewm(alpha=2 / 21, adjust=False).mean()
+    assert np.allclose(indicator_window(exchange, 'ema'), ema.iloc[-WINDOW:])
+
+
+def test_rsi_and_atr(exchange):
+    close = KLINES['Close']
+    change = close.diff()
+    gains, losses = wilder(change.clip(lower=0), 14), wilder(-change.clip(upper=0), 14)
+    rsi = 100 - 100 / (1 + gains / losses)
+    true_range = pd.concat([KLINES['High'] - KLINES['Low'],
+                            (KLINES['High'] - close.shift()).abs(),
+                            (KLINES['Low'] - close.shift()).abs()], axis=1).max(axis=1)
+
+    assert np.allclose(indicator_window(exchange, 'rsi'), rsi.iloc[-WINDOW:])
+    assert np.allclose(indicator_window(exchange, 'atr'), wilder(true_range, 14).iloc[-WINDOW:])
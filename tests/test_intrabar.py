@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from binance_bot_simulation.binance.binance_download_data import change_df_types
+from binance_bot_simulation.binance.kline_store import KlineStore, to_ms
+from binance_bot_simulation.simulation.intrabar import IntrabarCandles
+
+MINUTE_MS = 60 * 1000
+
+
+def minute_klines(start_time: pd.Timestamp, end_time: pd.Timestamp):
+    rows = [[open_ms, 1 + i, 2 + i, 0.5 + i, 1.5 + i, 10, open_ms + MINUTE_MS - 1, 15, 3, 5, 7.5]
+            for i, open_ms in enumerate(range(to_ms(start_time), to_ms(end_time), MINUTE_MS))]
+    df = pd.DataFrame(rows, columns=['Open time', 'Open', 'High', 'Low', 'Close', 'Volume', 'Close time',
+                                     'Quote asset volume', 'Number of trades', 'Taker buy base asset volume',
+                                     'Taker buy quote asset volume'])
+    df['Coin'] = 'BTC'
+    df['interval'] = '1m'
+    df['minutes_interval'] = 1
+    df['isClose'] = True
+    change_df_types(df)
+    return df
+
+
+def test_candles_that_are_stored_later_are_found(tmp_path):
+    kline_store = KlineStore(str(tmp_path))
+    intrabar = IntrabarCandles(kline_store, '1m')
+    bar_close = pd.Timestamp('2021-01-01 01:00')
+    assert intrabar.candles('BTCUSDT', bar_close, 60) is None
+
+    kline_store.merge('BTCUSDT', '1m', minute_klines(pd.Timestamp('2021-01-01'), bar_close),
+                      [(pd.Timestamp('2021-01-01'), bar_close)])
+    opens, highs, lows = intrabar.candles('BTCUSDT', bar_close, 60)
+    assert np.array_equal(opens, np.arange(1, 61))
+    assert np.array_equal(highs, np.arange(2, 62))
+    assert np.array_equal(lows, np.arange(0.5, 60.5))
+
+    # a bar after the stored range is found after the store covers it too
+    next_close = bar_close + pd.Timedelta(hours=1)
+    assert intrabar.candles('BTCUSDT', next_close, 60) is None
+    kline_store.merge('BTCUSDT', '1m', minute_klines(bar_close, next_close), [(bar_close, next_close)])
+    assert len(intrabar.candles('BTCUSDT', next_close, 60)[0]) == 60
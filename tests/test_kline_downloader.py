@@ -0,0 +1,136 @@
+import time
+import asyncio
+
+import aiohttp
+import pandas as pd
+import pytest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from binance_bot_simulation.binance.kline_downloader import KlineDownloader
+
+MINUTE_MS = 60 * 1000
+
+
+class FakeKlineServer:
+    """
+    Local server of the binance klines endpoint, it answers with 1m klines of the asked range, and the first requests
+    can be answered with scripted error responses
+    """
+
+    def __init__(self, responses=(), used_weight=None):
+        """
+        :param responses: list of (status, headers) of the first requests, the next requests get klines
+        :param used_weight: the value of the used weight header of the klines responses
+        """
+        self.responses = list(responses)
+        self.used_weight = used_weight
+        # (monotonic time, query params) of each request
+        self.requests = []
+        self.app = web.Application()
+        self.app.router.add_get(KlineDownloader.KLINES_PATH, self.klines)
+        self.server = TestServer(self.app)
+
+    async def __aenter__(self):
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.server.close()
+
+    @property
+    def url(self):
+        return str(self.server.make_url('')).rstrip('/')
+
+    async def klines(self, request):
+        self.requests.append((time.monotonic(), dict(request.query)))
+        if self.responses:
+            status, headers = self.responses.pop(0)
+            return web.json_response({'code': -1, 'msg': 'error'}, status=status, headers=headers)
+        start_ms = int(request.query['startTime'])
+        end_ms = int(request.query['endTime'])
+        limit = int(request.query['limit'])
+        first_open = -(-start_ms // MINUTE_MS) * MINUTE_MS
+        klines = [[open_ms, '1', '2', '0.5', '1.5', '10', open_ms + MINUTE_MS - 1, '15', 3, '5', '7.5', '0']
+                  for open_ms in range(first_open, end_ms + 1, MINUTE_MS)][:limit]
+        headers = {} if self.used_weight is None else {'X-MBX-USED-WEIGHT-1M': str(self.used_weight)}
+        return web.json_response(klines, headers=headers)
+
+
+def download(server: FakeKlineServer, start_time, end_time, **downloader_params):
+    async def run():
+        async with server:
+            async with KlineDownloader(base_url=server.url, **downloader_params) as downloader:
+                return await downloader.download('BTCUSDT', '1m', start_time, end_time), downloader
+
+    return asyncio.run(run())
+
+
+def test_pages():
+    start_time = pd.Timestamp('2021-01-01')
+    end_time = start_time + pd.Timedelta(minutes=2499)
+    server = FakeKlineServer()
+    klines, _ = download(server, start_time, end_time)
+
+    open_times = [kline[0] for kline in klines]
+    assert len(open_times) == 2500
+    assert open_times == list(range(open_times[0], open_times[0] + 2500 * MINUTE_MS, MINUTE_MS))
+    pages = sorted((int(params['startTime']), int(params['endTime'])) for _, params in server.requests)
+    assert len(pages) == 3
+    assert all(int(params['limit']) == KlineDownloader.PAGE_LIMIT for _, params in server.requests)
+    assert all(end - start < KlineDownloader.PAGE_LIMIT * MINUTE_MS for start, end in pages)
+    assert all(end + 1 == next_start for (_, end), (next_start, _) in zip(pages, pages[1:]))
+
+
+def test_used_weight_header_syncs_the_budget():
+    start_time = pd.Timestamp('2021-01-01')
+    server = FakeKlineServer(used_weight=1190)
+    _, downloader = download(server, start_time, start_time + pd.Timedelta(minutes=10), weight_per_minute=1200)
+
+    # binance says that almost all of the weight of the minute was used, whatever the local budget thinks
+    assert downloader.limiter.available <= 1200 - 1190 + 1
+
+
+@pytest.mark.parametrize('status', [429, 418])
+def test_retry_after_pauses_the_requests(status):
+    start_time = pd.Timestamp('2021-01-01')
+    server = FakeKlineServer(responses=[(status, {'Retry-After': '1'})])
+    klines, _ = download(server, start_time, start_time + pd.Timedelta(minutes=10), backoff=0.01)
+
+    assert len(klines) == 11
+    assert len(server.requests) == 2
+    # the retry waits for Retry-After and not only for the backoff
+    assert server.requests[1][0] - server.requests[0][0] >= 0.9
+
+
+def test_server_errors_are_retried_with_exponential_backoff():
+    start_time = pd.Timestamp('2021-01-01')
+    server = FakeKlineServer(responses=[(500, {}), (503, {})])
+    klines, _ = download(server, start_time, start_time + pd.Timedelta(minutes=10), backoff=0.1)
+
+    assert len(klines) == 11
+    times = [request_time for request_time, _ in server.requests]
+    assert len(times) == 3
+    assert times[1] - times[0] >= 0.1
+    assert times[2] - times[1] >= 0.2
+
+
+def test_gives_up_after_max_retries():
+    start_time = pd.Timestamp('2021-01-01')
+    server = FakeKlineServer(responses=[(503, {})] * 3)
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        download(server, start_time, start_time + pd.Timedelta(minutes=10), max_retries=2, backoff=0.01)
+
+    assert error.value.status == 503
+    assert len(server.requests) == 3
+
+
+def test_client_errors_are_not_retried():
+    start_time = pd.Timestamp('2021-01-01')
+    server = FakeKlineServer(responses=[(400, {})])
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        download(server, start_time, start_time + pd.Timedelta(minutes=10), backoff=0.01)
+
+    assert error.value.status == 400
+    assert len(server.requests) == 1
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from binance_bot_simulation.exchange_bots.ledger import Ledger
+
+
+def test_rows_are_the_copies_of_the_last_state():
+    start = pd.Timestamp('2021-01-01')
+    state = {'BTC Amount': 0., 'BTC Price': 100., 'USDT Amount': 1000.}
+    ledger = Ledger(start, **state)
+    # the history as the portfolio kept it before, a copy of the state dictionary for each timestamp
+    rows = {start: dict(state)}
+    state = rows[start]
+    for i in range(1, 3 * Ledger.INITIAL_CAPACITY):
+        # some updates come in the same timestamp as the last one
+        timestamp = start + pd.Timedelta(minutes=i // 2)
+        ledger.new_row(timestamp)
+        if timestamp not in rows:
+            rows[timestamp] = state = dict(state)
+        for values in ledger, state:
+            values['BTC Price'] = 100. + i % 7
+            if i % 5 == 0:
+                values['BTC Amount'] += 1
+                values['USDT Amount'] -= values['BTC Price']
+
+    expected = pd.DataFrame.from_dict(rows, orient='index')
+    assert len(ledger) == len(expected)
+    pd.testing.assert_frame_equal(ledger.to_frame(), expected, check_index_type=False, check_freq=False)
+    pd.testing.assert_frame_equal(ledger.to_frame(10), expected.iloc[-10:], check_index_type=False, check_freq=False)
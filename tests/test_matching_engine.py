@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from binance_bot_simulation.exchange_bots.orders import LimitSpotOrder, StopLimitSpotOrder, SpotOrder
+from binance_bot_simulation.simulation.matching_engine import MatchingEngine
+
+TIMESTAMP = pd.Timestamp('2021-01-01')
+
+
+def scan_fills(orders, triggered, open_price, high, low):
+    """
+    Fills of a scan over all of the resting orders, the way the exchange went over its open orders
+    :param triggered: the ids of the stop orders that were triggered and rest as limit orders, it is updated
+    :return: the fills of (order, price) and the orders that keep resting
+    """
+    fills, resting = [], []
+    for order in orders:
+        buy = order.side == SpotOrder.BUY
+        if order.order_type == SpotOrder.STOP_LIMIT and id(order) not in triggered:
+            trigger_price = max(order.stop_price, open_price) if buy else min(order.stop_price, open_price)
+            if (buy and high >= order.stop_price) or (not buy and low <= order.stop_price):
+                if (buy and order.price >= trigger_price) or (not buy and order.price <= trigger_price):
+                    fills.append((order, trigger_price))
+                    continue
+                triggered.add(id(order))
+            resting.append(order)
+        elif buy and low <= order.price:
+            fills.append((order, min(order.price, open_price)))
+        elif not buy and high >= order.price:
+            fills.append((order, max(order.price, open_price)))
+        else:
+            resting.append(order)
+    return fills, resting
+
+
+def test_fills_are_the_fills_of_a_scan_over_all_the_orders():
+    rng = np.random.default_rng(0)
+    engine = MatchingEngine()
+    for _ in range(2000):
+        side = SpotOrder.BUY if rng.random() < 0.5 else SpotOrder.SELL
+        price = float(np.round(rng.uniform(90, 110), 1))
+        params = dict(side=side, coin='BTC', quoted='USDT', amount=1, timestamp=TIMESTAMP)
+        if rng.random() < 0.7:
+            engine.add(LimitSpotOrder(price, **params))
+        else:
+            limit_offset = float(np.round(rng.uniform(-1, 1), 1))
+            engine.add(StopLimitSpotOrder(price, price + limit_offset, **params))
+
+    triggered = set()
+    for _ in range(200):
+        open_price = float(np.round(rng.uniform(95, 105), 1))
+        high = open_price + float(np.round(rng.uniform(0, 3), 1))
+        low = open_price - float(np.round(rng.uniform(0, 3), 1))
+        expected_fills, expected_resting = scan_fills(engine.orders(), triggered, open_price, high, low)
+        fills = engine.match('BTC', open_price, high, low)
+
+        assert sorted((id(order), price) for order, price in fills) == \
+               sorted((id(order), price) for order, price in expected_fills)
+        # the fills are in the order that the prices were reached from the open price
+        distances = [abs(price - open_price) for _, price in fills]
+        assert distances == sorted(distances)
+        assert sorted(map(id, engine.orders())) == sorted(map(id, expected_resting))
+    assert len(engine) < 2000
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from binance_bot_simulation.exchange_bots.order_book import OrderBook
+
+
+def spot_orders():
+    return [{'Id': i, 'Time': pd.Timestamp('2021-01-01') + pd.Timedelta(hours=i), 'Coin': coin,
+             'Quoted Symbol': 'USDT', 'Amount': 0.5 + i, 'Price': 100. * (i + 1), 'Side': side, 'filled': 1.,
+             'Percent': 10.}
+            for i, (coin, side) in enumerate([('BTC', 'BUY'), ('ETH', 'BUY'), ('BTC', 'SELL')])]
+
+
+def spot_book(orders):
+    book = OrderBook.spot()
+    for order in orders:
+        book.append(order)
+    return book
+
+
+def test_orders_are_read_back_as_the_appended_dictionaries():
+    orders = spot_orders()
+    book = spot_book(orders)
+
+    assert len(book) == 3
+    assert list(book) == orders
+    assert book[0] == orders[0]
+    assert book[-1] == orders[-1]
+    assert book[1:] == orders[1:]
+    with pytest.raises(IndexError):
+        book[3]
+
+
+def test_columns_are_arrays():
+    book = spot_book(spot_orders())
+
+    assert np.array_equal(book['Price'], [100., 200., 300.])
+    assert [book.categories('Coin')[code] for code in book['Coin']] == ['BTC', 'ETH', 'BTC']
+    assert list(book.select(coin='BTC', side='SELL')) == spot_orders()[2:]
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from binance_bot_simulation.binance.resample import resample_klines
+
+from strategies import random_klines
+
+
+def test_candles_are_built_from_the_lower_interval():
+    df = random_klines('BTC', '1m', 1, 60 * 24 * 3 + 37, 0, start='2021-01-01 00:07')
+    resampled = resample_klines(df, '4h')
+
+    expected = df.set_index('Open time').resample('4h').agg({'Open': 'first', 'High': 'max', 'Low': 'min',
+                                                             'Close': 'last', 'Volume': 'sum'})
+    # the first candle started before the data, and the last one didn't end in it
+    assert resampled['Open time'].iloc[0] == pd.Timestamp('2021-01-01 04:00')
+    assert resampled.index[-1] == pd.Timestamp('2021-01-04')
+    expected = expected.loc[resampled['Open time']]
+    for column in ['Open', 'High', 'Low', 'Close', 'Volume']:
+        assert np.allclose(resampled[column].to_numpy(), expected[column].to_numpy())
+
+
+def test_candles_with_gaps_are_dropped():
+    df = random_klines('BTC', '1m', 1, 60 * 24, 0, start='2021-01-01')
+    # binance has no candles for the minutes of a downtime
+    downtime = (df.index > pd.Timestamp('2021-01-01 05:10')) & (df.index <= pd.Timestamp('2021-01-01 05:20'))
+    df = df.loc[~downtime]
+    resampled = resample_klines(df, '1h')
+
+    assert len(resampled) == 23
+    assert pd.Timestamp('2021-01-01 05:00') not in set(resampled['Open time'])
+
+
+def test_months():
+    df = random_klines('BTC', '1h', 60, 24 * (31 + 28 + 3), 0, start='2021-01-01')
+    resampled = resample_klines(df, '1M')
+
+    assert list(resampled['Open time']) == [pd.Timestamp('2021-01-01'), pd.Timestamp('2021-02-01')]
+    assert list(resampled.index) == [pd.Timestamp('2021-02-01'), pd.Timestamp('2021-03-01')]
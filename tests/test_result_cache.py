@@ -0,0 +1,29 @@
+import os
+
+from binance_bot_simulation.simulation.result_cache import SimulationCache
+
+
+def cache_size(root):
+    return sum(os.path.getsize(os.path.join(folder, name))
+               for folder, _, names in os.walk(root) for name in names if name.endswith('.pkl'))
+
+
+def test_size_is_bounded_for_caches_of_several_processes(tmp_path):
+    result = b'x' * 1000
+    # the caches of two workers of a sweep that write to the same folder
+    workers = [SimulationCache(str(tmp_path), max_size=10 * 1024) for _ in range(2)]
+    for i in range(40):
+        workers[i % 2].put(f'{i:064x}', result)
+        assert cache_size(tmp_path) <= 10 * 1024
+
+    # the last results are kept
+    assert workers[0].get(f'{39:064x}') == result
+    assert workers[1].get(f'{38:064x}') == result
+
+
+def test_replacing_a_result_does_not_grow_the_cache(tmp_path):
+    cache = SimulationCache(str(tmp_path), max_size=10 * 1024)
+    for _ in range(40):
+        cache.put('0' * 64, b'x' * 1000)
+    assert cache.get('0' * 64) == b'x' * 1000
+    assert len(os.listdir(tmp_path / '00')) == 1
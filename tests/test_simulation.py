@@ -0,0 +1,72 @@
+import pandas as pd
+
+from binance_bot_simulation.simulation.simulation import Simulation
+
+from strategies import CrossStrategy, random_klines
+
+START = pd.Timestamp('2021-01-03')
+
+
+FEEDS = [random_klines(coin, interval, minutes, n, seed)
+         for coin, interval, minutes, n, seed in [('BTC', '15m', 15, 1000, 0), ('BTC', '1h', 60, 250, 10),
+                                                  ('ETH', '15m', 15, 1000, 1), ('ETH', '1h', 60, 250, 11)]]
+
+
+def simulation(**params):
+    simulation = Simulation(simulation_start_time=START, verbose=False, **params)
+    for df in FEEDS:
+        simulation.add_data_feed(df['Coin'].iloc[0], df['interval'].iloc[0], df)
+    simulation.create_portfolio(BTC=0, ETH=0, USDT=10000)
+    return simulation
+
+
+def test_start_returns_the_order_book_and_the_candles():
+    sim = simulation()
+    sim.add_strategy(CrossStrategy(['BTC', 'ETH'], 'USDT'))
+    order_book, candles = sim.start()
+
+    assert order_book is sim.portfolio.spot_order_book
+    # the candles before the start of the simulation are the history of the strategy preparation
+    assert len(candles) == sum((df.index >= START).sum() for df in FEEDS)
+    assert candles.index[0] == START
+    assert candles.index.is_monotonic_increasing
+    # candles that close together are ordered by their interval and then by their coin
+    same_time = candles.loc[candles.index[3]]
+    assert list(zip(same_time['minutes_interval'], same_time['Coin'])) == [(15, 'BTC'), (15, 'ETH'),
+                                                                           (60, 'BTC'), (60, 'ETH')]
+
+
+def test_synchronous_loop_is_the_same_as_the_asynchronous_loop():
+    portfolios = []
+    for synchronous in [True, False]:
+        sim = simulation(synchronous=synchronous)
+        sim.add_strategy(CrossStrategy(['BTC', 'ETH'], 'USDT'))
+        sim.start()
+        portfolios.append(sim.portfolio)
+    sync_portfolio, async_portfolio = portfolios
+
+    assert len(sync_portfolio.spot_order_book) > 0
+    # the ids of the orders keep counting between the simulations
+    pd.testing.assert_frame_equal(sync_portfolio.spot_order_book.to_frame().drop(columns='Id'),
+                                  async_portfolio.spot_order_book.to_frame().drop(columns='Id'))
+    pd.testing.assert_frame_equal(sync_portfolio.history(), async_portfolio.history())
+
+
+def test_strategies_of_one_simulation_are_the_same_as_separate_simulations():
+    parameters = [dict(fast=3, slow=8), dict(fast=5, slow=20), dict(fast=2, slow=4)]
+    sim = simulation()
+    for params in parameters:
+        sim.add_strategy(CrossStrategy(['BTC', 'ETH'], 'USDT', **params))
+    sim.start()
+    # each strategy trades with its own portfolio
+    assert len({len(portfolio.spot_order_book) for portfolio in sim.portfolios}) == len(parameters)
+
+    for params, portfolio in zip(parameters, sim.portfolios):
+        separate = simulation()
+        separate.add_strategy(CrossStrategy(['BTC', 'ETH'], 'USDT', **params))
+        separate.start()
+
+        assert len(portfolio.spot_order_book) > 0
+        pd.testing.assert_frame_equal(portfolio.spot_order_book.to_frame().drop(columns='Id'),
+                                      separate.portfolio.spot_order_book.to_frame().drop(columns='Id'))
+        pd.testing.assert_frame_equal(portfolio.history(), separate.portfolio.history())
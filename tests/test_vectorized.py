@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from binance_bot_simulation.exchange_bots.orders import MarketSpotOrder, SpotOrder
+from binance_bot_simulation.exchange_bots.strategy import Strategy
+from binance_bot_simulation.simulation.simulation import Simulation
+from binance_bot_simulation.simulation.vectorized import SignalStrategy, vectorized_backtest
+
+from strategies import random_klines
+
+START = pd.Timestamp('2021-01-03')
+
+
+class SignalCross(SignalStrategy):
+
+    def target_weights(self, dfs):
+        weights = {}
+        for coin, df in dfs.items():
+            fast = df['Close'].rolling(self.params['fast']).mean()
+            slow = df['Close'].rolling(self.params['slow']).mean()
+            weights[coin] = np.where(slow.isna(), np.nan, np.where(fast > slow, 0.9, 0.0))
+        return pd.DataFrame(weights, index=next(iter(dfs.values())).index)
+
+
+class WeightsStrategy(Strategy):
+    """
+    Event driven strategy that trades BTC to the target weights of a signal strategy
+    """
+
+    def __init__(self, weights: pd.Series):
+        super().__init__(['BTC'], 'USDT')
+        self.weights = weights
+        self.last_weight = np.nan
+
+    async def prepare_strategy(self):
+        pass
+
+    @Strategy.on_candle_close('15m')
+    def on_15m(self, interval, candle):
+        weight = self.weights.get(candle['Close time'], np.nan)
+        if np.isnan(weight) or weight == self.last_weight:
+            return
+        self.last_weight = weight
+        price = candle['Close']
+        btc_amount = self.portfolio.ledger['BTC Amount']
+        worth = self.portfolio.ledger['USDT Amount'] + btc_amount * price
+        trade = weight * worth / price - btc_amount
+        side = SpotOrder.BUY if trade > 0 else SpotOrder.SELL
+        self.exchange.set_order(MarketSpotOrder(price, side=side, coin='BTC', quoted='USDT', amount=abs(trade),
+                                                timestamp=candle['Close time']))
+
+
+def test_final_worth_is_the_same_as_the_simulation():
+    df = random_klines('BTC', '15m', 15, 3000, 0)
+    signal = SignalCross(['BTC'], 'USDT', '15m', fast=5, slow=20)
+    test_df = df.loc[df.index >= START]
+    result = vectorized_backtest({'BTC': test_df}, signal, {'BTC': 0, 'USDT': 10000})
+
+    simulation = Simulation(simulation_start_time=START, verbose=False)
+    simulation.add_data_feed('BTC', '15m', df)
+    simulation.create_portfolio(BTC=0, USDT=10000)
+    simulation.add_strategy(WeightsStrategy(signal.target_weights({'BTC': test_df})['BTC']))
+    simulation.start()
+
+    assert len(result.spot_order_book) == len(simulation.portfolio.spot_order_book) > 0
+    assert result.portfolio_worth() == pytest.approx(simulation.portfolio.portfolio_worth())
+
+
+def test_empty_feed():
+    df = random_klines('BTC', '15m', 15, 100, 0).iloc[:0]
+    result = vectorized_backtest({'BTC': df}, SignalCross(['BTC'], 'USDT', '15m', fast=5, slow=20),
+                                 {'BTC': 0, 'USDT': 10000})
+
+    assert len(result.spot_order_book) == 0
+    assert len(result.history) == 0
+    assert np.isnan(result.portfolio_worth())